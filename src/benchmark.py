@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from logging_config import setup_logging
+from benchmark_servers import Fixtures, StandInServer
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["import", "birthday_wishes", "holiday_messages"]
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def configure_environment(server_url, db_path, args):
+    # Point every client at the stand-in server; must run before the configuration is first loaded
+    os.environ.update({
+        "DB_PATH": str(db_path),
+        "LLM_CACHE_DB_PATH": str(Path(db_path).parent / "llm_cache.db"),
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "PEOPLEFORCE_API_URL": f"{server_url}/api",
+        "PEOPLEFORCE_API_KEY": "benchmark",
+        "OPENAI_API_BASE": f"{server_url}/v1",
+        "OPENAI_API_KEY": "benchmark",
+        "WEBHOOK_URL": f"{server_url}/webhook",
+        "IMPORT_MODE": "full",
+        "GOOGLE_CHAT_RATE_PER_SECOND": str(args.chat_rate),
+        "GOOGLE_CHAT_BURST": str(args.chat_rate),
+        "LOG_LEVEL": args.log_level,
+    })
+
+
+def remove_database(db_path):
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+
+
+def run_once(server, db_path, date, executor):
+    # One pass over the pipeline on a fresh database; returns seconds and item counts per stage
+    from db_functions import DBConnection
+    from import_data import PeopleForceDataImporter
+    from happy_birthday import HappyBirthday
+    from public_holiday import PublicHoliday
+
+    remove_database(db_path)
+    result = {}
+
+    started = time.perf_counter()
+    PeopleForceDataImporter().update_data_from_api()
+    result["import"] = {"seconds": time.perf_counter() - started, "items": len(server.fixtures.employees)}
+
+    db = DBConnection(db_path)
+    try:
+        webhook_url = os.environ["WEBHOOK_URL"]
+        sent_before = len(server.webhook_messages)
+        started = time.perf_counter()
+        HappyBirthday(db, webhook_url, executor).send_birthday_wishes(date)
+        result["birthday_wishes"] = {"seconds": time.perf_counter() - started,
+                                     "items": len(server.webhook_messages) - sent_before}
+
+        sent_before = len(server.webhook_messages)
+        started = time.perf_counter()
+        PublicHoliday(db, webhook_url, executor).generate_and_send_holiday_message(date)
+        result["holiday_messages"] = {"seconds": time.perf_counter() - started,
+                                      "items": len(server.webhook_messages) - sent_before}
+    finally:
+        db.close()
+    return result
+
+
+def summarize(runs):
+    summary = {}
+    for stage in STAGES:
+        seconds = [run[stage]["seconds"] for run in runs]
+        items = [run[stage]["items"] for run in runs]
+        summary[stage] = {
+            "p50_seconds": round(percentile(seconds, 0.5), 4),
+            "p95_seconds": round(percentile(seconds, 0.95), 4),
+            "mean_seconds": round(sum(seconds) / len(seconds), 4),
+            "items": items[-1],
+            "items_per_second": round(sum(items) / sum(seconds), 1) if sum(seconds) > 0 else None,
+        }
+    return summary
+
+
+def compare(summary, baseline_path):
+    # Print the p50/p95 change of every stage against an earlier results file
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["stages"]
+    print(f"\nCompared with {baseline_path}:")
+    for stage in STAGES:
+        if stage not in baseline:
+            continue
+        for key in ("p50_seconds", "p95_seconds"):
+            old, new = baseline[stage][key], summary[stage][key]
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"  {stage:18} {key:12} {old:8.4f}s -> {new:8.4f}s ({change:+.1f}%)")
+
+
+def main(args):
+    fixtures = Fixtures(args.date, employees=args.employees, per_page=args.per_page, policies=args.policies,
+                        holidays_per_policy=args.holidays_per_policy, birthdays_per_day=args.birthdays)
+    server = StandInServer(fixtures, llm_latency=args.llm_latency, llm_jitter=args.llm_jitter,
+                           llm_error_rate=args.llm_error_rate).start()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "benchmark.db"
+        configure_environment(server.url, db_path, args)
+        setup_logging()
+        from generation_executor import GenerationExecutor
+        executor = GenerationExecutor()
+
+        runs = []
+        try:
+            for run in range(args.warmup + args.runs):
+                result = run_once(server, db_path, args.date, executor)
+                if run >= args.warmup:
+                    runs.append(result)
+                print(f"run {run + 1}/{args.warmup + args.runs}: " + ", ".join(
+                    f"{stage}={result[stage]['seconds']:.3f}s ({result[stage]['items']} items)" for stage in STAGES)
+                    + (" [warm-up]" if run < args.warmup else ""))
+        finally:
+            server.stop()
+
+    summary = summarize(runs)
+    results = {
+        "created_at": datetime.utcnow().isoformat(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output_dir", "compare")},
+        "stages": summary,
+        "upstream": server.report(),
+        "runs": runs,
+    }
+
+    print("\nStage               p50        p95        items/s")
+    for stage in STAGES:
+        stats = summary[stage]
+        print(f"  {stage:18} {stats['p50_seconds']:8.4f}s {stats['p95_seconds']:8.4f}s {stats['items_per_second']}")
+    print("\nUpstream requests:")
+    for endpoint, stats in results["upstream"].items():
+        print(f"  {endpoint:32} {stats['requests']:6} requests, {stats['errors']} errors, avg {stats['avg_ms']} ms")
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"benchmark-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    with open(output_path, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+    if args.compare:
+        compare(summary, args.compare)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark import, birthday and holiday jobs against local '
+                                                 'stand-ins for PeopleForce, OpenAI and Google Chat.')
+    parser.add_argument('--date', type=str, help='Date the jobs run for, format YYYY-MM-DD', default='2024-12-25')
+    parser.add_argument('--runs', type=int, help='Measured runs', default=5)
+    parser.add_argument('--warmup', type=int, help='Unmeasured runs before the measured ones', default=1)
+    parser.add_argument('--employees', type=int, help='Employees served by the stand-in', default=2000)
+    parser.add_argument('--per-page', type=int, help='Records per page of paginated endpoints', default=50)
+    parser.add_argument('--policies', type=int, help='Holiday policies (locations)', default=8)
+    parser.add_argument('--holidays-per-policy', type=int, help='Holidays per policy', default=20)
+    parser.add_argument('--birthdays', type=int, help='Employees with a birthday on --date', default=5)
+    parser.add_argument('--llm-latency', type=float, help='Mean chat completion latency in seconds', default=0.2)
+    parser.add_argument('--llm-jitter', type=float, help='Chat completion latency jitter in seconds', default=0.1)
+    parser.add_argument('--llm-error-rate', type=float, help='Share of chat completions that fail', default=0.0)
+    parser.add_argument('--llm-cache', action='store_true', help='Keep the LLM response cache enabled')
+    parser.add_argument('--chat-rate', type=float, help='Google Chat messages per second', default=50)
+    parser.add_argument('--log-level', type=str, help='Application log level during the benchmark', default='WARNING')
+    parser.add_argument('--output-dir', type=str, help='Directory for the results file',
+                        default=str(project_root / 'app' / 'benchmarks'))
+    parser.add_argument('--compare', type=str, help='Earlier results file to compare against', default=None)
+    main(parser.parse_args())
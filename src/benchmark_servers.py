@@ -0,0 +1,228 @@
+import re
+import sys
+import json
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP = '%Y-%m-%dT%H:%M:%S.000Z'
+# Holiday names shared by several policies, so grouping has real work to do
+HOLIDAY_NAMES = ["New Year's Day", "Christmas Day", "Easter Monday", "Labour Day", "Independence Day"]
+
+
+class Fixtures:
+    # Deterministic PeopleForce data: employees, holiday policies with locations, holidays
+    def __init__(self, date, employees=2000, per_page=50, policies=8, holidays_per_policy=20,
+                 birthdays_per_day=5, division="Paysera Engineering", seed=42):
+        self.date = datetime.strptime(date, '%Y-%m-%d')
+        self.per_page = per_page
+        rng = random.Random(seed)
+        stamp = (self.date - timedelta(days=30)).strftime(TIMESTAMP)
+
+        self.policies = [{"id": policy_id, "name": f"Policy {policy_id}", "country_code": f"C{policy_id}",
+                          "created_at": stamp, "updated_at": stamp}
+                         for policy_id in range(1, policies + 1)]
+        self.locations = [{"id": policy["id"], "name": f"Office {policy['id']}", "address": f"Street {policy['id']}",
+                           "time_zone": "Europe/Vilnius", "holiday_policy_id": policy["id"],
+                           "created_at": stamp, "updated_at": stamp}
+                          for policy in self.policies]
+
+        self.employees = []
+        for employee_id in range(1, employees + 1):
+            if employee_id <= birthdays_per_day:
+                birth = self.date.replace(year=1992)  # These employees have their birthday on the benchmark date
+            else:
+                birth = self.date + timedelta(days=rng.randint(1, 360))
+                birth = birth.replace(year=rng.randint(1970, 2000), day=min(birth.day, 28) if birth.month == 2 else birth.day)
+            self.employees.append({
+                "id": employee_id, "active": True, "employee_number": f"E{employee_id:05d}",
+                "full_name": f"Employee {employee_id}", "first_name": "Employee", "last_name": str(employee_id),
+                "email": f"employee{employee_id}@example.com", "date_of_birth": birth.strftime('%Y-%m-%d'),
+                "gender": rng.choice(["male", "female"]), "avatar_url": None,
+                "probation_ends_on": None, "hired_on": f"{rng.randint(2010, 2023)}-03-01",
+                "slack_username": None, "linkedin_url": None,
+                "position": {"name": "Engineer"}, "job_level": {"name": "Senior"},
+                "division": {"name": division}, "department": {"name": f"Department {employee_id % 7}"},
+                "reporting_to": None, "location": self.locations[employee_id % len(self.locations)],
+                "created_at": stamp, "updated_at": stamp,
+            })
+
+        self.holidays = []
+        for policy in self.policies:
+            for index in range(holidays_per_policy):
+                # The first holiday of every policy falls on the benchmark date
+                occurs_on = (self.date + timedelta(days=index * 7)).strftime('%Y-%m-%d')
+                self.holidays.append({
+                    "id": len(self.holidays) + 1,
+                    "name": HOLIDAY_NAMES[(policy["id"] % 2 + index) % len(HOLIDAY_NAMES)],
+                    "occurs_on": occurs_on, "starts_on": occurs_on, "ends_on": occurs_on, "working": False,
+                    "compensated_on": None, "observed_on": None, "holiday_policy_id": policy["id"],
+                    "created_at": stamp, "updated_at": stamp,
+                })
+
+    def page(self, records, page):
+        # One page in PeopleForce's shape, with the page count in metadata.pagination
+        pages = max(1, -(-len(records) // self.per_page))
+        start = (page - 1) * self.per_page
+        return {"data": records[start:start + self.per_page],
+                "metadata": {"pagination": {"page": page, "pages": pages, "count": len(records)}}}
+
+
+def _holiday_list(prompt):
+    # The holiday prompts end with the day's holidays as JSON
+    try:
+        return json.loads(prompt.split("Holiday list:\n", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _group_holidays(holidays):
+    groups = {}
+    for holiday in holidays:
+        groups.setdefault(holiday["holiday_name"], []).append(holiday["location_name"])
+    return [{"holiday_name": name, "locations": locations} for name, locations in groups.items()]
+
+
+def chat_completion_content(request):
+    # A plausible answer for each kind of prompt the application sends
+    prompt = request["messages"][-1]["content"]
+    holidays = _holiday_list(prompt)
+    if holidays is not None and request.get("response_format"):
+        groups = [dict(group, announcement=f"*{group['holiday_name']}* in {', '.join(group['locations'])}")
+                  for group in _group_holidays(holidays)]
+        return json.dumps({"holidays": groups})
+    if holidays is not None:
+        return "```json\n" + json.dumps({"holidays": _group_holidays(holidays)}) + "\n```"
+    return "*Stand-in message* " + re.sub(r'\s+', ' ', prompt[-120:])
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+
+class StandInServer:
+    # Local PeopleForce, OpenAI and Google Chat stand-ins on one port
+    def __init__(self, fixtures, llm_latency=0.2, llm_jitter=0.1, llm_error_rate=0.0, seed=42):
+        self.fixtures = fixtures
+        self.llm_latency = llm_latency
+        self.llm_jitter = llm_jitter
+        self.llm_error_rate = llm_error_rate
+        self.rng = random.Random(seed)
+        self.stats = {}
+        self.webhook_messages = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stand-in-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Stand-in server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record(self, endpoint, seconds, error=False):
+        with self._lock:
+            stats = self.stats.setdefault(endpoint, EndpointStats())
+            stats.requests += 1
+            stats.errors += int(error)
+            stats.total_seconds += seconds
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.webhook_messages = []
+
+    def report(self):
+        with self._lock:
+            return {endpoint: {"requests": stats.requests, "errors": stats.errors,
+                               "avg_ms": round(stats.total_seconds / stats.requests * 1000, 1)}
+                    for endpoint, stats in sorted(self.stats.items())}
+
+    def _llm_delay(self):
+        with self._lock:
+            failed = self.rng.random() < self.llm_error_rate
+            delay = max(0.0, self.llm_latency + self.rng.uniform(-self.llm_jitter, self.llm_jitter))
+        return delay, failed
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real services
+
+            def _reply(self, status, body=None):
+                payload = json.dumps(body if body is not None else {}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                started = time.monotonic()
+                parts = urlsplit(self.path)
+                page = int(parse_qs(parts.query).get("page", ["1"])[0])
+                fixtures = server.fixtures
+                routes = {
+                    "/api/employees": lambda: fixtures.page(fixtures.employees, page),
+                    "/api/holidays": lambda: fixtures.page(fixtures.holidays, page),
+                    "/api/holiday_policies": lambda: {"data": fixtures.policies},
+                    "/api/locations": lambda: {"data": fixtures.locations},
+                    "/v1/models": lambda: {"data": [{"id": "gpt-4o-mini"}]},
+                }
+                route = routes.get(parts.path)
+                if route is None:
+                    self._reply(404)
+                else:
+                    self._reply(200, route())
+                server.record(f"GET {parts.path}", time.monotonic() - started, route is None)
+
+            def do_POST(self):
+                started = time.monotonic()
+                path = urlsplit(self.path).path
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if path == "/v1/chat/completions":
+                    delay, failed = server._llm_delay()
+                    time.sleep(delay)
+                    if failed:
+                        self._reply(500, {"error": {"message": "stand-in failure"}})
+                    else:
+                        self._reply(200, {"choices": [{"index": 0, "message": {
+                            "role": "assistant", "content": chat_completion_content(body)}}]})
+                    server.record(f"POST {path}", time.monotonic() - started, failed)
+                elif path.startswith("/webhook"):
+                    with server._lock:
+                        server.webhook_messages.append(body)
+                    self._reply(200, {"name": "spaces/bench/messages/1"})
+                    server.record("POST /webhook", time.monotonic() - started)
+                else:
+                    self._reply(404)
+                    server.record(f"POST {path}", time.monotonic() - started, True)
+
+            def log_message(self, format, *args):
+                pass  # Request logging would dominate the benchmark output
+
+        return Handler
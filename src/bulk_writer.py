@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import pickle
+import sqlite3
+import logging
+import tempfile
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from db_functions import configure_connection
+from metrics import IMPORT_ROWS
+
+logger = logging.getLogger(__name__)
+
+
+class BulkWriter:
+    # Rows and statements are staged in a temporary file while the import fetches, then replayed in order in one
+    # short transaction on commit: readers never see a half-imported run, and the database write lock is not
+    # held during network fetches, so the lease, outbox and local delivery writes keep going
+    def __init__(self, db_path, batch_size=None):
+        self.db_path = db_path
+        # Number of buffered rows per table that triggers an executemany flush
+        self.batch_size = max(1, int(batch_size or os.getenv("IMPORT_BATCH_SIZE", 500)))
+        self.connection = None
+        self._staging = None  # Temporary file of pickled (statement, rows) batches, in the order they are run
+        self._buffers = {}  # table -> (statement, rows)
+        self._seen_keys = {}  # table -> keys already buffered, used for in-memory dedupe
+        self.rows_written = {}
+        self.write_seconds = 0.0
+        self.transaction_seconds = 0.0
+        self._started = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def open(self):
+        # Start staging; nothing touches the database until commit()
+        self._staging = tempfile.TemporaryFile(prefix="bulk-writer-")
+        self._started = time.monotonic()
+        logger.debug(f"BulkWriter staging writes for {self.db_path} with batch_size={self.batch_size}")
+
+    def add(self, table, statement, row, key=None):
+        # Buffer a row; rows with a key that was already buffered for this table are dropped
+        if key is not None:
+            seen = self._seen_keys.setdefault(table, set())
+            if key in seen:
+                return
+            seen.add(key)
+        rows = self._buffers.setdefault(table, (statement, []))[1]
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self._flush_table(table)
+
+    def _stage(self, table, statement, rows):
+        pickle.dump((table, statement, rows), self._staging, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _flush_table(self, table):
+        statement, rows = self._buffers.get(table, (None, []))
+        if not rows:
+            return
+        self._stage(table, statement, list(rows))
+        rows.clear()
+
+    def flush(self):
+        for table in list(self._buffers):
+            self._flush_table(table)
+
+    def execute(self, query, params=()):
+        # Stage a single statement to run after everything buffered so far; its result is not available
+        self.flush()
+        self._stage(None, query, [params])
+
+    def _replay(self):
+        # Run the staged batches in order in one transaction
+        self._staging.seek(0)
+        self.connection = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        configure_connection(self.connection)  # Same busy_timeout/synchronous profile as the app connections
+        started = time.monotonic()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                try:
+                    table, statement, rows = pickle.load(self._staging)
+                except EOFError:
+                    break
+                self.connection.executemany(statement, rows)
+                if table is not None:
+                    self.rows_written[table] = self.rows_written.get(table, 0) + len(rows)
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        finally:
+            self.transaction_seconds = self.write_seconds = time.monotonic() - started
+
+    def commit(self):
+        try:
+            self.flush()
+            self._replay()
+        finally:
+            self._close()
+        for table, rows in self.rows_written.items():
+            IMPORT_ROWS.labels(table=table).inc(rows)
+        self.log_report()
+
+    def rollback(self):
+        # Nothing was written yet, dropping the staged batches is enough
+        logger.error("BulkWriter discarded the staged import writes")
+        self._close()
+
+    def _close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self._staging is not None:
+            self._staging.close()
+            self._staging = None
+        self._buffers.clear()
+        self._seen_keys.clear()
+
+    def stats(self):
+        total_rows = sum(self.rows_written.values())
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return {
+            "rows": dict(self.rows_written),
+            "total_rows": total_rows,
+            "write_seconds": round(self.write_seconds, 3),
+            "rows_per_second": round(total_rows / self.write_seconds) if self.write_seconds else 0,
+            "staged_seconds": round(elapsed, 3),
+            "transaction_seconds": round(self.transaction_seconds, 3),
+        }
+
+    def log_report(self):
+        stats = self.stats()
+        logger.info(f"BulkWriter committed {stats['total_rows']} rows {stats['rows']} in "
+                    f"{stats['write_seconds']:.3f}s ({stats['rows_per_second']} rows/sec), "
+                    f"after staging for {stats['staged_seconds']:.2f}s; transaction open for "
+                    f"{stats['transaction_seconds']:.2f}s")
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from metrics import BREAKER_STATE, BREAKER_REJECTED
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    # Raised instead of calling an upstream whose breaker is open
+    pass
+
+
+class DeadlineExceeded(Exception):
+    # Raised when a job's deadline passes before an upstream call could be made or finished
+    pass
+
+
+class Deadline:
+    # Point in time a job has to be done by; upstream calls are bounded by what is left of it
+    def __init__(self, seconds):
+        self.seconds = float(seconds)
+        self.expires_at = time.monotonic() + self.seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, what):
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g}s passed before {what}")
+
+    def timeout(self, connect_timeout, read_timeout):
+        # (connect, read) timeout for a request that must end by the deadline
+        remaining = self.remaining()
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+
+class CircuitBreaker:
+    # Fails fast while an upstream is failing. Closed: calls go through and their outcomes fill a sliding
+    # window; once it holds min_calls outcomes and the failure rate reaches the threshold, the breaker opens.
+    # Open: calls are rejected for open_seconds. Half-open: up to half_open_probes calls go through; a success
+    # closes the breaker, a failure opens it again.
+    def __init__(self, name, failure_rate=None, window=None, min_calls=None, open_seconds=None,
+                 half_open_probes=None):
+        prefix = f"{name.upper()}_BREAKER"
+        self.name = name
+        self.failure_rate = float(failure_rate or os.getenv(f"{prefix}_FAILURE_RATE", 0.5))
+        self.window = int(window or os.getenv(f"{prefix}_WINDOW", 20))
+        self.min_calls = int(min_calls or os.getenv(f"{prefix}_MIN_CALLS", 5))
+        self.open_seconds = float(open_seconds or os.getenv(f"{prefix}_OPEN_SECONDS", 60))
+        self.half_open_probes = int(half_open_probes or os.getenv(f"{prefix}_HALF_OPEN_PROBES", 1))
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=self.window)  # True for a success
+        self._opened_at = 0.0
+        self._probes = 0  # Half-open calls in flight
+        self._lock = threading.Lock()
+        BREAKER_STATE.labels(breaker=name).set(STATE_VALUES[CLOSED])
+        logger.info(f"Circuit breaker {name}: opens at {self.failure_rate:.0%} failures of the last "
+                    f"{self.window} calls (at least {self.min_calls}), probes after {self.open_seconds:g}s")
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.warning(f"Circuit breaker {self.name} {self.state} -> {state}")
+            self.state = state
+            BREAKER_STATE.labels(breaker=self.name).set(STATE_VALUES[state])
+
+    def allow(self):
+        # Whether a call may go through now; every allowed call must be followed by record() or release()
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+                self._probes = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+        BREAKER_REJECTED.labels(breaker=self.name).inc()
+        return False
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpen(f"Circuit breaker {self.name} is {self.state}")
+
+    def record(self, ok):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if ok:
+                    self._outcomes.clear()
+                    self._set_state(CLOSED)
+                else:
+                    self._open()
+                return
+            if self.state == OPEN:
+                return  # A call started before the breaker opened
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def release(self):
+        # End an allowed call without an outcome, e.g. one cut short by the caller's own deadline
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._set_state(OPEN)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name):
+    # Process-wide breaker per upstream, shared by every client instance talking to it
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
@@ -0,0 +1,71 @@
+import os
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Set the project root directory
+project_root = Path(__file__).resolve().parents[1]
+
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() == "true"
+
+
+class Config:
+    # Application settings read from the environment (and the project .env file) once per process
+    def __init__(self):
+        self.log_level = os.getenv("LOG_LEVEL", "DEBUG").upper()
+        # The log file is appended to and rotated at LOG_FILE_MAX_BYTES, keeping LOG_FILE_BACKUPS old files;
+        # LOG_FILE_MODE=w (truncate on every start) only applies with LOG_FILE_MAX_BYTES=0
+        self.log_file_mode = os.getenv("LOG_FILE_MODE", "a")
+        self.log_file_max_bytes = int(os.getenv("LOG_FILE_MAX_BYTES", 10 * 1024 * 1024))
+        self.log_file_backups = int(os.getenv("LOG_FILE_BACKUPS", 5))
+        self.db_path = os.getenv("DB_PATH", "/app/db/pe_ass.db")
+        self.webhook_url = os.getenv("WEBHOOK_URL")
+        self.webhook_routes = os.getenv("WEBHOOK_ROUTES")  # JSON routing table, or a path to one
+        self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        self.openai_api_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1").rstrip('/')
+        self.peopleforce_api_url = os.getenv("PEOPLEFORCE_API_URL")
+        self.peopleforce_api_key = os.getenv("PEOPLEFORCE_API_KEY")
+        self.notify_if_none = _flag("NOTIFY_IF_NONE", "false")
+        self.outbox_enabled = _flag("OUTBOX_ENABLED", "true")
+        self.leader_election = _flag("LEADER_ELECTION", "true")  # Only the lease holder runs scheduled jobs
+        self.admin_token = os.getenv("ADMIN_TOKEN")  # Admin endpoints are disabled unless set
+        # Timezone for employees and holidays whose location has no (known) time_zone
+        self.default_time_zone = os.getenv("DEFAULT_TIME_ZONE", "UTC")
+        # Local send times ('HH:MM'); when set, the job runs once per timezone group instead of at a UTC hour
+        self.birthday_local_time = os.getenv("BIRTHDAY_LOCAL_TIME") or None
+        self.holiday_local_time = os.getenv("HOLIDAY_LOCAL_TIME") or None
+        # How long after the local send time a missed run (e.g. during a restart) is still made up
+        self.local_delivery_window_minutes = int(os.getenv("LOCAL_DELIVERY_WINDOW_MINUTES", 180))
+        # Seconds a birthday or holiday job may wait for the LLM before sending template messages; 0 waits indefinitely
+        self.birthday_deadline_seconds = float(os.getenv("BIRTHDAY_DEADLINE_SECONDS", 120))
+        self.holiday_deadline_seconds = float(os.getenv("HOLIDAY_DEADLINE_SECONDS", 120))
+        # Production server (serve.py): HTTP workers and threads, and the scheduler process' admin/metrics port
+        self.web_server = os.getenv("WEB_SERVER", "waitress").lower()  # waitress or gunicorn
+        self.web_host = os.getenv("WEB_HOST", "0.0.0.0")
+        self.web_port = int(os.getenv("WEB_PORT", 8080))
+        self.web_workers = int(os.getenv("WEB_WORKERS", 1))  # Processes; gunicorn only
+        self.web_threads = int(os.getenv("WEB_THREADS", 8))  # Threads per worker process
+        self.scheduler_port = int(os.getenv("SCHEDULER_PORT", 8081))  # 0 disables the scheduler's own endpoints
+        # Scheduled job times (UTC)
+        self.daily_update_hour = int(os.getenv("DAILY_UPDATE_HOUR", 6))
+        self.daily_update_minute = int(os.getenv("DAILY_UPDATE_MINUTE", 0))
+        self.birthday_hour = int(os.getenv("BIRTHDAY_HOUR", 7))
+        self.birthday_minute = int(os.getenv("BIRTHDAY_MINUTE", 0))
+        self.holiday_hour = int(os.getenv("HOLIDAY_HOUR", 7))
+        self.holiday_minute = int(os.getenv("HOLIDAY_MINUTE", 1))
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config():
+    # Load the .env file and build the configuration on first use; later calls return the same object
+    global _config
+    with _config_lock:
+        if _config is None:
+            load_dotenv(dotenv_path=project_root / '.env')
+            _config = Config()
+        return _config
@@ -1,16 +1,35 @@
 import sqlite3
 import logging
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
-# Setup logging configuration
-from logging_config import setup_logging
-setup_logging()
+from config import get_config
+from metrics import DB_QUERY_LATENCY, DB_QUERY_ERRORS
+
 logger = logging.getLogger(__name__)
 
+def sqlite_pragmas():
+    # Connection pragmas, tunable through environment variables
+    return {
+        "cache_size": int(os.getenv("DB_CACHE_SIZE", -20000)),  # Negative value means KiB, ~20 MB
+        "mmap_size": int(os.getenv("DB_MMAP_SIZE", 268435456)),  # 256 MB
+        "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL").upper(),
+        "busy_timeout": int(os.getenv("DB_BUSY_TIMEOUT", 5000)),  # Milliseconds
+    }
+
+def configure_connection(conn, pragmas=None):
+    # Apply the tuned pragma profile to a connection
+    for name, value in (pragmas or sqlite_pragmas()).items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
 class DBConnection:
-    def __init__(self, db_path=None):
-        self.db_path = Path(db_path or os.getenv("DB_PATH", "/app/db/pe_ass.db")).resolve()
+    def __init__(self, db_path=None, pool_size=None):
+        self.db_path = Path(db_path or get_config().db_path).resolve()
         logger.info(f"Database path: {self.db_path}")  # Log the database path
 
         # Ensure the directory exists
@@ -19,33 +38,92 @@ class DBConnection:
             logger.info(f"Creating directory for database: {db_dir}")
             db_dir.mkdir(parents=True, exist_ok=True)
 
+        self.pool_size = max(1, int(pool_size or os.getenv("DB_POOL_SIZE", 4)))
+        self.journal_mode = os.getenv("DB_JOURNAL_MODE", "WAL").upper()
+        self.pragmas = sqlite_pragmas()
+
+        # Idle read-only connections and a bound on how many may be open at once
+        self._readers = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(self.pool_size)
+        # SQLite allows a single writer, so one long-lived read-write connection is shared under a lock
+        self._write_lock = threading.Lock()
+
         try:
-            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.connection.row_factory = sqlite3.Row  # Enable access to columns by name
-            self.cursor = self.connection.cursor()
-            logger.info(f"DBConnection initialized with database path: {self.db_path}")
+            self._writer = self._connect(read_only=False)
+            # WAL lets readers run while the import or a job is writing
+            mode = self._writer.execute(f"PRAGMA journal_mode = {self.journal_mode}").fetchone()[0]
+            logger.info(f"DBConnection initialized with database path: {self.db_path}, journal mode: {mode}, "
+                        f"pool size: {self.pool_size}")
         except sqlite3.OperationalError as e:
             logger.error(f"Error connecting to database: {e}")
             raise e
 
-    def execute(self, query, params=None):
-        # Create a new connection for each query
-        with sqlite3.connect(self.db_path, check_same_thread=False) as conn:
-            conn.row_factory = sqlite3.Row  # Enable access to columns by name
-            cursor = conn.cursor()
-            if params:
-                result = cursor.execute(query, params)
-            else:
-                result = cursor.execute(query)
-            conn.commit()
-        return result.fetchall()  # Return the query results
+    def _connect(self, read_only):
+        if read_only:
+            conn = sqlite3.connect(f"{self.db_path.as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Enable access to columns by name
+        return configure_connection(conn, self.pragmas)
+
+    @contextmanager
+    def connection(self, read_only=False):
+        # Borrow a pooled connection; read-write use is committed or rolled back on exit
+        if read_only:
+            with self._reader_slots:
+                try:
+                    conn = self._readers.get_nowait()
+                except queue.Empty:
+                    conn = self._connect(read_only=True)
+                try:
+                    yield conn
+                except sqlite3.DatabaseError:
+                    conn.close()  # Do not return a possibly broken connection to the pool
+                    conn = None
+                    raise
+                finally:
+                    if conn is not None:
+                        self._readers.put(conn)
+        else:
+            with self._write_lock:
+                try:
+                    yield self._writer
+                    self._writer.commit()
+                except Exception:
+                    self._writer.rollback()
+                    raise
+
+    def execute(self, query, params=None, read_only=None):
+        # SELECT statements go through the read-only pool unless told otherwise
+        if read_only is None:
+            read_only = query.lstrip().upper().startswith("SELECT")
+        mode = "read" if read_only else "write"
+        started = time.perf_counter()
+        try:
+            with self.connection(read_only=read_only) as conn:
+                cursor = conn.execute(query, params or ())
+                return cursor.fetchall()  # Return the query results
+        except Exception:
+            DB_QUERY_ERRORS.labels(mode=mode).inc()
+            raise
+        finally:
+            DB_QUERY_LATENCY.labels(mode=mode).observe(time.perf_counter() - started)
+
+    def close(self):
+        # Close every pooled connection
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            self._writer.close()
 
     def check_database(self):
-        # Check the availability of the database by creating a new connection
+        # Check the availability of the database using a pooled connection
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT 1")
+            with self.connection(read_only=True) as conn:
+                conn.execute("SELECT 1")
             logger.info("Database is available.")
             return True
         except Exception as e:
@@ -55,10 +133,9 @@ class DBConnection:
     def check_table_exists(self, table_name):
         # Check if a specific table exists in the database
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';")
-                result = cursor.fetchone()
+            with self.connection(read_only=True) as conn:
+                result = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name = ?;",
+                                      (table_name,)).fetchone()
             if result:
                 logger.info(f"Table {table_name} exists.")
                 return True
@@ -69,8 +146,17 @@ class DBConnection:
             logger.error(f"Error checking if table {table_name} exists: {e}")
             return False
 
+def ensure_column(cursor, table, column, column_type):
+    # Add a column to an existing table if it is missing, returns True when it was added
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    if column in columns:
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    logger.info(f"Added column {column} to table {table}")
+    return True
+
 def create_database(db_path=None):
-    db_path = Path(db_path or os.getenv("DB_PATH", "/app/db/app.db")).resolve()
+    db_path = Path(db_path or get_config().db_path).resolve()
     try:
         # Ensure the 'db' directory exists
         db_dir = db_path.parent
@@ -103,7 +189,19 @@ def create_database(db_path=None):
                 department TEXT,
                 manager_id INTEGER,
                 created_at DATETIME,
-                updated_at DATETIME)
+                updated_at DATETIME,
+                birth_md TEXT)
+            ''')
+            # Databases created before birth_md existed get the column and a backfill
+            if ensure_column(cursor, 'Employees', 'birth_md', 'TEXT'):
+                cursor.execute('''
+                UPDATE Employees SET birth_md = substr(date_of_birth, 6, 5)
+                WHERE birth_md IS NULL AND date_of_birth IS NOT NULL
+                ''')
+            # Birthday lookups filter on birth month-day and active flag; routes then partition by division and others
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_employees_birth_md
+            ON Employees (birth_md, active, division)
             ''')
             # Create Locations table
             cursor.execute('''
@@ -140,6 +238,87 @@ def create_database(db_path=None):
                 created_at DATETIME,
                 updated_at DATETIME)
             ''')
+            # Create SyncState table holding per-entity import watermarks
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS SyncState (
+                entity TEXT PRIMARY KEY,
+                watermark DATETIME,
+                last_full_sync DATETIME,
+                updated_at DATETIME)
+            ''')
+
+            # Create PregeneratedMessages table holding messages rendered ahead of their send date
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS PregeneratedMessages (
+                job TEXT,
+                date TEXT,
+                item_key TEXT,
+                fingerprint TEXT,
+                message TEXT,
+                created_at DATETIME,
+                PRIMARY KEY (job, date, item_key))
+            ''')
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_pregenerated_messages_date
+            ON PregeneratedMessages (date)
+            ''')
+            # Create Outbox table; entries move pending -> sending -> sent, or to dead after too many failures
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS Outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT UNIQUE,
+                job TEXT,
+                date TEXT,
+                item_key TEXT,
+                webhook_url TEXT,
+                payload TEXT,
+                status TEXT,
+                attempts INTEGER,
+                next_attempt_at DATETIME,
+                claimed_at DATETIME,
+                last_error TEXT,
+                created_at DATETIME,
+                sent_at DATETIME)
+            ''')
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_outbox_status_next_attempt
+            ON Outbox (status, next_attempt_at)
+            ''')
+            # Create ZoneDeliveries table recording which timezone groups got a daily job for their local date
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ZoneDeliveries (
+                job TEXT,
+                time_zone TEXT,
+                local_date TEXT,
+                started_at DATETIME,
+                finished_at DATETIME,
+                PRIMARY KEY (job, time_zone, local_date))
+            ''')
+            # Runs recorded before finished_at existed only ever recorded their start; count them as finished
+            if ensure_column(cursor, 'ZoneDeliveries', 'finished_at', 'DATETIME'):
+                cursor.execute("UPDATE ZoneDeliveries SET finished_at = started_at WHERE finished_at IS NULL")
+            # Create LeaderLease table; the replica holding an unexpired lease runs the scheduled jobs
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS LeaderLease (
+                name TEXT PRIMARY KEY,
+                holder TEXT,
+                token INTEGER,
+                expires_at REAL,
+                renewed_at REAL)
+            ''')
+            # Holiday lookups filter on occurs_on and join on holiday_policy_id; name makes the index covering
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_all_holidays_occurs_on_policy
+            ON All_Holidays (occurs_on, holiday_policy_id, name)
+            ''')
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_employees_location_id
+            ON Employees (location_id)
+            ''')
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_employees_manager_id
+            ON Employees (manager_id)
+            ''')
 
             conn.commit()
         logger.info("Database created successfully.")
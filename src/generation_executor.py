@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from circuit_breaker import CircuitOpen, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationResult:
+    # Outcome of a single generation task, kept at the same index as its input
+    def __init__(self, index, value=None, error=None, elapsed=0.0):
+        self.index = index
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"GenerationResult(index={self.index}, {status}, elapsed={self.elapsed:.2f}s)"
+
+
+class GenerationExecutor:
+    def __init__(self, max_workers=None):
+        # Concurrency limit for LLM calls, configurable through the environment
+        self.max_workers = max(1, int(max_workers or os.getenv("LLM_CONCURRENCY", 4)))
+        logger.info(f"GenerationExecutor initialized with max_workers={self.max_workers}")
+
+    def _run_one(self, index, func, item):
+        started = time.monotonic()
+        try:
+            value = func(item)
+            return GenerationResult(index, value=value, elapsed=time.monotonic() - started)
+        except Exception as e:
+            # An open breaker or a passed deadline is expected, a traceback would add nothing
+            logger.error(f"Generation task {index} failed: {e}", exc_info=not isinstance(e, (CircuitOpen, DeadlineExceeded)))
+            return GenerationResult(index, error=e, elapsed=time.monotonic() - started)
+
+    def map(self, func, items, deadline=None):
+        # Apply func to every item in parallel and return results in the original order.
+        # A failing item is reported in its GenerationResult and never aborts the batch.
+        # With a deadline, items not done when it passes are reported as DeadlineExceeded and not waited for.
+        items = list(items)
+        if not items:
+            return []
+
+        started = time.monotonic()
+        workers = min(self.max_workers, len(items))
+        if workers == 1:
+            results = []
+            for index, item in enumerate(items):
+                if deadline is not None and deadline.expired():
+                    results.append(GenerationResult(index, error=DeadlineExceeded("deadline passed before start"),
+                                                    elapsed=0.0))
+                else:
+                    results.append(self._run_one(index, func, item))
+        else:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-gen")
+            try:
+                futures = [pool.submit(self._run_one, index, func, item) for index, item in enumerate(items)]
+                wait(futures, timeout=deadline.remaining() if deadline is not None else None)
+                results = [future.result() if future.done() else
+                           GenerationResult(index, error=DeadlineExceeded("deadline passed"),
+                                            elapsed=time.monotonic() - started)
+                           for index, future in enumerate(futures)]
+            finally:
+                # Calls still running end on their own request timeout, which the deadline also bounds
+                pool.shutdown(wait=deadline is None, cancel_futures=True)
+
+        failed = sum(1 for result in results if not result.ok)
+        logger.info(f"Generated {len(results) - failed}/{len(results)} items in "
+                    f"{time.monotonic() - started:.2f}s using {workers} worker(s)")
+        return results
@@ -1,7 +1,11 @@
 import os
+import re
+import time
+import random
 import requests
 import json
 import sys
+import threading
 from pathlib import Path
 import logging
 
@@ -10,29 +14,125 @@ project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
 
 # Import custom logging configuration
-from logging_config import setup_logging  # Ensure the import path is correct
+from logging_config import setup_logging
+from http_transport import get_transport
+from metrics import track_upstream
 
-# Setup logging configuration
-setup_logging()
 logger = logging.getLogger(__name__)  # Create a logger for this module
 
+# Delivery modes for a batch of messages
+DELIVERY_INDIVIDUAL = "individual"  # One post per message
+DELIVERY_CARD = "card"  # All messages combined into one cardsV2 post
+DELIVERY_THREAD = "thread"  # One post per message, all in the same thread
+
+
+class TokenBucket:
+    # Token bucket limiting how often a webhook may be called
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)  # Tokens added per second
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Block until a token is available, returns the time spent waiting
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+# One bucket per webhook URL, shared by every GoogleChatWebhook posting to that space
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _bucket_for(url):
+    with _buckets_lock:
+        bucket = _buckets.get(url)
+        if bucket is None:
+            bucket = TokenBucket(float(os.getenv("GOOGLE_CHAT_RATE_PER_SECOND", 1)),
+                                 float(os.getenv("GOOGLE_CHAT_BURST", 1)))
+            _buckets[url] = bucket
+        return bucket
+
+
+class DeliveryResult:
+    # Outcome of delivering one message
+    def __init__(self, message, response=None, error=None):
+        self.message = message
+        self.response = response
+        self.error = error
+
+    @property
+    def status_code(self):
+        return self.response.status_code if self.response is not None else None
+
+    @property
+    def ok(self):
+        return self.response is not None and self.response.status_code == 200
+
+    def __repr__(self):
+        return f"DeliveryResult(ok={self.ok}, status_code={self.status_code}, error={self.error!r})"
+
+
+def _to_card_text(message):
+    # Google Chat cards use HTML-like markup instead of the *bold*/_italic_ text formatting
+    text = message.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    text = re.sub(r'\*([^*\n]+)\*', r'<b>\1</b>', text)
+    text = re.sub(r'(?<!\w)_([^_\n]+)_(?!\w)', r'<i>\1</i>', text)
+    return text.replace('\n', '<br>')
+
+
 class GoogleChatWebhook:
     def __init__(self, webhook_url):
         self.url = webhook_url
+        self.transport = get_transport()  # Shared pooled HTTP transport
+        self.bucket = _bucket_for(webhook_url)  # Per-space rate limit
+        self.delivery_mode = os.getenv("GOOGLE_CHAT_DELIVERY_MODE", DELIVERY_INDIVIDUAL).lower()
+        self.max_rate_limit_retries = int(os.getenv("GOOGLE_CHAT_MAX_429_RETRIES", 3))
+
+    def _post(self, payload, params=None):
+        # Post a payload within the rate limit; a 429 means the message was not accepted, so it is retried
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            response = self.transport.post(self.url, json=payload, params=params)
+            logger.debug(f"Message being sent: {json.dumps(payload)}")
+            logger.debug(f"Server response: {response.status_code}, {response.text}")
+            if response.status_code != 429 or attempt >= self.max_rate_limit_retries:
+                return response
+            retry_after = response.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else random.uniform(1, 2 ** (attempt + 1))
+            logger.warning(f"Google Chat rate limit hit, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
 
-    def send_message(self, message):
+    @track_upstream("google_chat", is_error=lambda response: response is None or response.status_code != 200)
+    def send_message(self, message, thread_key=None):
         # Ensure the message is a string
         if not isinstance(message, str):
             logger.error("The message to be sent must be a string")
             return None
 
         app_message = {"text": message}
+        params = None
+        if thread_key:
+            # Reply into the thread with this key, or start it if it does not exist yet
+            app_message["thread"] = {"threadKey": thread_key}
+            params = {"messageReplyOption": "REPLY_MESSAGE_FALLBACK_TO_NEW_THREAD"}
         try:
             # Send the message to the webhook URL
-            response = requests.post(self.url, json=app_message)
-            logger.debug(f"Message being sent: {json.dumps(app_message)}")
-            logger.debug(f"Server response: {response.status_code}, {response.text}")
-            
+            response = self._post(app_message, params)
             if response.status_code != 200:
                 logger.error(f"Error sending message: {response.text}")
             return response
@@ -40,7 +140,55 @@ class GoogleChatWebhook:
             logger.error(f"Error while sending message: {e}")
             return None
 
+    @track_upstream("google_chat", is_error=lambda response: response is None or response.status_code != 200)
+    def send_card(self, messages, title, card_id="daily-digest"):
+        # Combine several messages into a single cardsV2 post
+        app_message = {
+            "cardsV2": [{
+                "cardId": card_id,
+                "card": {
+                    "header": {"title": title},
+                    "sections": [
+                        {"widgets": [{"textParagraph": {"text": _to_card_text(message)}}]}
+                        for message in messages
+                    ]
+                }
+            }]
+        }
+        try:
+            response = self._post(app_message)
+            if response.status_code != 200:
+                logger.error(f"Error sending card: {response.text}")
+            return response
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error while sending card: {e}")
+            return None
+
+    def send_messages(self, messages, mode=None, thread_key=None, title=None):
+        # Deliver a day's messages in order and return one DeliveryResult per message
+        mode = (mode or self.delivery_mode).lower()
+        messages = [message for message in messages if isinstance(message, str)]
+        if not messages:
+            return []
+
+        if mode == DELIVERY_CARD and len(messages) > 1:
+            response = self.send_card(messages, title or "Announcements")
+            error = None if response is not None and response.status_code == 200 else "card delivery failed"
+            results = [DeliveryResult(message, response, error) for message in messages]
+        else:
+            key = thread_key if mode == DELIVERY_THREAD else None
+            results = []
+            for message in messages:
+                response = self.send_message(message, thread_key=key)
+                error = None if response is not None and response.status_code == 200 else "delivery failed"
+                results.append(DeliveryResult(message, response, error))
+
+        delivered = sum(1 for result in results if result.ok)
+        logger.info(f"Delivered {delivered}/{len(results)} message(s) to Google Chat in '{mode}' mode")
+        return results
+
 if __name__ == "__main__":
+    setup_logging()
     # Get the webhook URL from environment variables
     webhook_url = os.getenv("WEBHOOK_URL")
     webhook = GoogleChatWebhook(webhook_url)
@@ -1,9 +1,10 @@
 import logging
 import os
 import sys
-from datetime import datetime
+import calendar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
-from dotenv import load_dotenv
 
 project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
@@ -12,43 +13,95 @@ from db_functions import DBConnection
 from google_space_webhook import GoogleChatWebhook  
 from logging_config import setup_logging
 from openai_api import OpenAI_API
-from prompt_templates import HB_prompt_template
+from generation_executor import GenerationExecutor
+from message_store import MessageStore, fingerprint
+from routing import RoutingTable, Route, load_routing_table
+from config import get_config
+from prompt_templates import HB_prompt_template, HB_fallback_template
+from metrics import TEMPLATE_FALLBACKS
 import argparse  # Import for command-line argument parsing
 
-setup_logging()
-load_dotenv()  # Load environment variables from .env file
-
-logging.info("Logging is set up.")
-
 class HappyBirthday:
-    def __init__(self, db_connection, webhook_url):
+    def __init__(self, db_connection, webhook_url, executor=None, store=None, outbox=None, routes=None):
         self.db = db_connection
-        self.webhook = GoogleChatWebhook(webhook_url)  # Initialize webhook
+        # Spaces to post to; by default every wish for the division goes to webhook_url
+        self.routes = routes or RoutingTable([Route("default", webhook_url, division=self.DIVISION)], implicit=True)
+        self.webhooks = {route.webhook_url: GoogleChatWebhook(route.webhook_url) for route in self.routes.routes}
+        self.api = OpenAI_API()  # Initialize OpenAI API once and reuse it for every wish
+        self.executor = executor or GenerationExecutor()  # Shared executor for parallel LLM calls
+        self.store = store or MessageStore(db_connection)  # Pregenerated wishes, reused at send time
+        self.outbox = outbox  # Durable delivery queue; without it messages are posted directly
         logging.info("HappyBirthday initialized with given database connection and webhook URL.")
 
+    DIVISION = "Paysera Engineering"
+
+    @staticmethod
+    def birthday_keys(day, feb29_fallback=None):
+        # Month-day keys celebrated on the given day; Feb 29 birthdays move to the fallback day in non-leap years
+        feb29_fallback = feb29_fallback or os.getenv("BIRTHDAY_FEB29_FALLBACK", "02-28")
+        key = day.strftime('%m-%d')
+        if key == feb29_fallback and not calendar.isleap(day.year):
+            return [key, '02-29']
+        return [key]
+
+    @staticmethod
+    def birthdays_query(key_count):
+        # Active employees whose birth month-day is one of key_count values, with what routes match on
+        placeholders = ', '.join('?' for _ in range(key_count))
+        return f'''
+            SELECT e.id, e.full_name, e.date_of_birth, e.gender, e.position_name, e.department, e.hired_on, e.birth_md,
+                   e.division, l.name AS location_name, l.time_zone
+            FROM Employees e LEFT JOIN Locations l ON l.id = e.location_id
+            WHERE e.birth_md IN ({placeholders}) AND e.active = 1
+        '''
+
+    def _query_birthdays(self, days):
+        # One indexed lookup on birth_md for all requested days and every route; rows no route wants are dropped
+        keys = {}
+        for day in days:
+            for key in self.birthday_keys(day):
+                keys.setdefault(key, day)
+        rows = self.routes.routed(self.db.execute(self.birthdays_query(len(keys)), tuple(keys)))
+        return rows, keys
+
     def find_birthdays(self, date=None):
         if date is None:
-            date = datetime.now().strftime('%m-%d')  # Default to today's date in '%m-%d' format
+            day = datetime.now()  # Default to today's date
         else:
             try:
-                # Ensure the date is in the correct format and reformat it
-                date = datetime.strptime(date, '%Y-%m-%d').strftime('%m-%d')
+                # Ensure the date is in the correct format
+                day = datetime.strptime(date, '%Y-%m-%d')
             except ValueError:
                 logging.error("Incorrect date format, should be YYYY-MM-DD")
                 return []
 
-        logging.info(f"Checking for birthdays on: {date}")  # Log the date being checked
-        query = '''
-            SELECT id, full_name, date_of_birth, gender, position_name, department, hired_on FROM Employees
-            WHERE strftime('%m-%d', date_of_birth) = ? AND active = 1 AND division = "Paysera Engineering"
-        '''
+        logging.info(f"Checking for birthdays on: {day.strftime('%m-%d')}")  # Log the date being checked
         try:
-            result = self.db.execute(query, (date,))
+            result, _ = self._query_birthdays([day])
             return result
         except Exception as e:
             logging.error("Error finding birthdays", exc_info=True)
             return []
 
+    def find_birthdays_in_range(self, start_date=None, days=7):
+        # Birthdays for `days` consecutive days starting at start_date, as (date, employee) pairs sorted by date
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else datetime.now()
+        except ValueError:
+            logging.error("Incorrect date format, should be YYYY-MM-DD")
+            return []
+
+        window = [start + timedelta(days=offset) for offset in range(days)]
+        logging.info(f"Checking for birthdays from {window[0].strftime('%Y-%m-%d')} "
+                     f"to {window[-1].strftime('%Y-%m-%d')}")
+        try:
+            rows, keys = self._query_birthdays(window)
+        except Exception as e:
+            logging.error("Error finding birthdays", exc_info=True)
+            return []
+        result = [(keys[row['birth_md']].strftime('%Y-%m-%d'), row) for row in rows]
+        return sorted(result, key=lambda item: item[0])
+
     @staticmethod
     def calculate_anniversaries(hired_on, current_date=None):
         if current_date is None:
@@ -64,7 +117,7 @@ class HappyBirthday:
 
         return years_difference + 1
 
-    def generate_birthday_wishes(self, employee, current_date=None):
+    def generate_birthday_wishes(self, employee, current_date=None, deadline=None):
         # Calculate the number of anniversaries
         anniversaries = HappyBirthday.calculate_anniversaries(employee['hired_on'], current_date)
 
@@ -84,11 +137,13 @@ class HappyBirthday:
         # Log the generated prompt
         logging.debug(f"Generated prompt for OpenAI: {prompt}")
 
-        # Create OpenAI client and send the request
-        openai_client = OpenAI_API()
-        response = openai_client.chat_completion(messages=[{"role": "user", "content": prompt}])
+        # Send the request using the shared OpenAI client
+        response = self.api.chat_completion(messages=[{"role": "user", "content": prompt}], use_case="birthday_wish",
+                                            deadline=deadline)
 
         # Log the received response
+        if not response.get('choices'):
+            raise ValueError(f"OpenAI returned no completion: {response.get('error')}")
         generated_response = response['choices'][0]['message']['content']
         logging.debug(f"Response from OpenAI: {generated_response}")
 
@@ -96,27 +151,133 @@ class HappyBirthday:
         personalized_wishes = f"*{employee['full_name']}*, {generated_response}"
         return personalized_wishes
 
-    def send_birthday_wishes(self, date=None, notify_if_none=False):
+    @staticmethod
+    def template_birthday_wishes(employee, current_date=None):
+        # Wish rendered without the LLM from the same employee fields, for when generation failed or ran late
+        anniversaries = HappyBirthday.calculate_anniversaries(employee['hired_on'], current_date) if employee['hired_on'] else 1
+        wishes = HB_fallback_template.format(department=employee['department'] or "Paysera",
+                                             position_name=employee['position_name'] or "professional",
+                                             birthdays=f"{anniversaries} birthday{'s' if anniversaries != 1 else ''}")
+        return f"*{employee['full_name']}*, {wishes}"
+
+    @staticmethod
+    def birthday_fingerprint(employee, date):
+        # Everything the generated wish depends on
+        fields = ('id', 'full_name', 'department', 'position_name', 'gender', 'date_of_birth', 'hired_on')
+        return fingerprint('birthday_wish', date, {field: employee[field] for field in fields}, HB_prompt_template)
+
+    def prepare_birthday_wishes(self, employees, date, deadline=None):
+        # Return one wish per employee (None when generation failed), reusing stored wishes whose inputs did not change
+        messages = [None] * len(employees)
+        pending = []
+        for index, employee in enumerate(employees):
+            employee_fingerprint = self.birthday_fingerprint(employee, date)
+            stored = self.store.get('birthday_wish', date, str(employee['id']), employee_fingerprint)
+            if stored is not None:
+                messages[index] = stored
+                logging.info(f"Using pregenerated birthday message for {employee['full_name']}.")
+            else:
+                pending.append((index, employee, employee_fingerprint))
+
+        # Generate the missing wishes in parallel, results come back in the original order
+        results = self.executor.map(lambda item: self.generate_birthday_wishes(item[1], date, deadline), pending,
+                                    deadline=deadline)
+        for (index, employee, employee_fingerprint), result in zip(pending, results):
+            if not result.ok:
+                logging.error(f"Failed to generate birthday message for {employee['full_name']}: {result.error}")
+                continue
+            messages[index] = result.value
+            self.store.put('birthday_wish', date, str(employee['id']), employee_fingerprint, result.value)
+        return messages
+
+    def send_birthday_wishes(self, date=None, notify_if_none=False, zone_group=None, deadline=None):
+        # With a zone_group only employees of locations in that timezone group are greeted, for its local date.
+        # Wishes not generated by the deadline, or while OpenAI is failing, are rendered from a template.
         today_birthdays = self.find_birthdays(date)
         if today_birthdays is None:
             message = "Error occurred while finding birthdays."
             logging.error(message)
             return
+        # Routes with nobody to greet anywhere on the date; they get the "no birthdays" notice if asked for
+        quiet_routes = {route.name for route, employees in self.routes.partition(today_birthdays) if not employees}
+        if zone_group is not None:
+            today_birthdays = [employee for employee in today_birthdays if zone_group.contains(employee['time_zone'])]
+            # The notice goes out once a day, with the default timezone group
+            notify_if_none = notify_if_none and zone_group.is_default
 
-        if not today_birthdays:
-            if notify_if_none:
-                message = "There are *NO* birthdays at Paysera Engineering today."
-                self.webhook.send_message(message)
-                logging.info(message)  # Log the absence of birthdays
-        else:
-            for employee in today_birthdays:
-                logging.info(f"Today is the birthday of {employee['full_name']} in {employee['department']}.")  # Log employee's birthday
-                birthday_wish = self.generate_birthday_wishes(employee)
-                message = f"{birthday_wish}"
-                self.webhook.send_message(message)
-                logging.info(f"Birthday message sent to Google Chat for {employee['full_name']}.")  # Log the message sending
+        for employee in today_birthdays:
+            logging.info(f"Today is the birthday of {employee['full_name']} in {employee['department']}.")  # Log employee's birthday
+
+        # Every wish is generated once, however many spaces it goes to
+        day = date or datetime.now().strftime('%Y-%m-%d')
+        wishes = self.prepare_birthday_wishes(today_birthdays, day, deadline) if today_birthdays else []
+        wish_by_id = {}
+        for employee, birthday_wish in zip(today_birthdays, wishes):
+            if birthday_wish is None:
+                logging.warning(f"Using the template birthday message for {employee['full_name']}.")
+                TEMPLATE_FALLBACKS.labels(job="birthday_wish").inc()
+                birthday_wish = self.template_birthday_wishes(employee, day)
+            wish_by_id[employee['id']] = birthday_wish
+
+        deliveries = []
+        notices = []  # (route, "no birthdays" message)
+        for route, employees in self.routes.partition(today_birthdays):
+            if not employees:
+                if notify_if_none and route.name in quiet_routes:
+                    message = f"There are *NO* birthdays at {route.describe()} today."
+                    notices.append((route, message))
+                    logging.info(message)  # Log the absence of birthdays
+                continue
+            recipients = [employee for employee in employees if employee['id'] in wish_by_id]
+            if recipients:
+                deliveries.append((route, recipients, [wish_by_id[employee['id']] for employee in recipients]))
+
+        if self.outbox is not None:
+            # Delivery is retried by the outbox worker; a rerun for the same day queues nothing new.
+            # Timezone groups share a date, so their entries (e.g. a day's card) are kept apart by the group.
+            # Without WEBHOOK_ROUTES or timezone groups the keys keep their unrouted shape, so entries queued
+            # before routing existed are still recognised
+            def route_key(route):
+                if zone_group is not None:
+                    return f"{route.name}@{zone_group.key}"
+                return None if self.routes.implicit else route.name
+
+            queued = 0
+            for route, recipients, messages in deliveries:
+                items = [(str(employee['id']), message) for employee, message in zip(recipients, messages)]
+                queued += self.outbox.enqueue_messages("birthday_wish", day, items, route.webhook_url,
+                                                       thread_key=f"birthdays-{day}", title="Happy birthday!",
+                                                       route=route_key(route))
+            for route, message in notices:
+                # The notice has a fixed item key, so it too is sent once per day and route
+                queued += self.outbox.enqueue_messages("birthday_wish", day, [("none", message)], route.webhook_url,
+                                                       route=route_key(route))
+            logging.info(f"Queued {queued} birthday message(s) for delivery to {len(deliveries) + len(notices)} "
+                         f"space(s).")
+            return queued
+
+        for route, message in notices:
+            self.webhooks[route.webhook_url].send_message(message)
+
+        # Deliver each space's wishes together, rate limited and optionally as one card or thread; spaces in parallel
+        def deliver(delivery):
+            route, recipients, messages = delivery
+            return self.webhooks[route.webhook_url].send_messages(messages, thread_key=f"birthdays-{day}",
+                                                                  title="Happy birthday!")
+
+        all_results = []
+        with ThreadPoolExecutor(max_workers=max(1, len(deliveries)), thread_name_prefix="birthday-send") as pool:
+            for (route, recipients, _), results in zip(deliveries, pool.map(deliver, deliveries)):
+                for employee, result in zip(recipients, results):
+                    if result.ok:
+                        logging.info(f"Birthday message sent to Google Chat ({route.name}) for {employee['full_name']}.")  # Log the message sending
+                    else:
+                        logging.error(f"Failed to send birthday message ({route.name}) for {employee['full_name']}: {result.error}")
+                all_results.extend(results)
+        return all_results
 
 if __name__ == "__main__":
+    setup_logging()
     parser = argparse.ArgumentParser(description='Send birthday wishes to employees.')
     parser.add_argument('--date', type=str, help='Date to check birthdays for, format YYYY-MM-DD', default=None)
     parser.add_argument('--notify-if-none', action='store_true', help='Send notification if no birthdays are found')
@@ -125,6 +286,6 @@ if __name__ == "__main__":
     logging.info(f"Script started with date: {args.date} and notify-if-none: {args.notify_if_none}")  # Log the provided date and notify-if-none flag
 
     db = DBConnection()
-    webhook_url = os.getenv("WEBHOOK_URL")  # Get the webhook URL from environment variables
-    birthday_celebrator = HappyBirthday(db, webhook_url)
+    config = get_config()
+    birthday_celebrator = HappyBirthday(db, config.webhook_url, routes=load_routing_table(config, HappyBirthday.DIVISION))
     birthday_celebrator.send_birthday_wishes(args.date, args.notify_if_none)
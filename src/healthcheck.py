@@ -1,7 +1,8 @@
-from flask import Blueprint
+from flask import Blueprint, jsonify
 from pathlib import Path
 import sys
 import logging
+import threading
 
 # Add the project root to the system path for module resolution
 project_root = Path(__file__).resolve().parents[1]
@@ -12,9 +13,8 @@ from logging_config import setup_logging
 from db_functions import DBConnection
 from openai_api import OpenAI_API
 from peopleforce_api import PeopleForceAPI
+from readiness import ReadinessChecker
 
-# Initialize logging configuration
-setup_logging()
 logger = logging.getLogger(__name__)
 
 # Create a Flask Blueprint for health checks
@@ -26,32 +26,49 @@ def health_check():
     logger.info("Health check requested")
     return 'OK', 200
 
+# Dependency clients and the readiness cache are created on the first probe and reused afterwards
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _client(name, factory):
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def check_database(timeout):
+    return _client("database", DBConnection).check_database()
+
+
+def check_openai(timeout):
+    return _client("openai", OpenAI_API).check_api_status(timeout=timeout)
+
+
+def check_peopleforce(timeout):
+    return _client("peopleforce", PeopleForceAPI).check_api_status(timeout=timeout)
+
+
+def get_readiness_checker():
+    return _client("readiness", lambda: ReadinessChecker({
+        "database": check_database,
+        "openai": check_openai,
+        "peopleforce": check_peopleforce,
+    }))
+
+
 @healthcheck.route('/ready')
 def readiness_check():
     """Endpoint to check if all dependencies are ready"""
-    # Check database availability
-    db = DBConnection()
-    logger.info("Checking database availability")
-    if not db.check_database():
-        logger.error("Database is not ready")
-        return 'DB down', 500
-
-    # Check OpenAI API availability
-    openai_api = OpenAI_API()
-    logger.info("Checking OpenAI API availability")
-    if not openai_api.check_api_status():
-        logger.error("OpenAI API is not ready")
-        return 'OpenAI API down', 500
-
-    # Check PeopleForce API availability
-    peopleforce_api = PeopleForceAPI()
-    logger.info("Checking PeopleForce API availability")
-    if not peopleforce_api.check_api_status():
-        logger.error("PeopleForce API is not ready")
-        return 'PeopleForce API down', 500
-
-    logger.info("All systems ready")
-    return 'OK', 200
+    # Checks run concurrently with a deadline each; results are cached so probes rarely reach upstream
+    snapshot, age = get_readiness_checker().status()
+    body = dict(snapshot, age_seconds=round(age, 1) if age is not None else None)
+    if snapshot["status"] != "ready":
+        logger.error(f"Not ready: {snapshot['checks']}")
+        return jsonify(body), 500
+    logger.debug("All systems ready")
+    return jsonify(body), 200
 
 @healthcheck.route('/ping')
 def ping_pong():
@@ -60,6 +77,7 @@ def ping_pong():
     return 'Pong', 200
 
 if __name__ == "__main__":
+    setup_logging()
     from flask import Flask
     app = Flask(__name__)
     app.register_blueprint(healthcheck)
@@ -0,0 +1,196 @@
+import os
+import re
+import sys
+import json
+import logging
+import unicodedata
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+logger = logging.getLogger(__name__)
+
+# Words that say nothing about which holiday it is
+STOPWORDS = frozenset({"the", "of", "s", "day", "holiday", "public", "bank", "and", "observed"})
+# Holidays about one country (independence, constitution, ...) are never grouped across countries,
+# however alike their names are
+NATIONAL_TERMS = frozenset({
+    "independence", "constitution", "statehood", "national", "republic", "restoration", "victory", "unity",
+    "flag", "proclamation", "liberation", "freedom", "neatkaribas", "proklamesanas", "iseseisvuspaev",
+    "taasiseseisvumispaev", "voidupuha", "niepodleglosci", "konstytucji", "valstybes", "atkurimo", "nacional",
+    "constitucion",
+})
+
+# Curated names of holidays shared by several countries, by English name; matched after normalization
+HOLIDAY_ALIASES = {
+    "New Year's Day": ["New Year", "Naujieji metai", "Jaungada diena", "Uusaasta", "Nowy Rok", "Año Nuevo",
+                       "Neujahr", "Нова година", "Viti i Ri"],
+    "New Year's Eve": ["Vecgada diena", "Silvester", "Nochevieja", "Sylwester"],
+    "Epiphany": ["Three Kings' Day", "Trzech Króli", "Święto Trzech Króli", "Epifanía del Señor", "Día de Reyes",
+                 "Heilige Drei Könige"],
+    "International Women's Day": ["Women's Day", "Tarptautinė moters diena", "Международен ден на жената"],
+    "Good Friday": ["Lielā Piektdiena", "Suur reede", "Viernes Santo", "Karfreitag", "Wielki Piątek"],
+    "Easter Sunday": ["Easter", "Velykos", "Lieldienas", "Pirmās Lieldienas", "Ülestõusmispühade 1. püha",
+                      "Wielkanoc", "Domingo de Pascua", "Ostersonntag", "Великден"],
+    "Easter Monday": ["Antroji Velykų diena", "Otrās Lieldienas", "Poniedziałek Wielkanocny", "Lunes de Pascua",
+                      "Ostermontag"],
+    "Labour Day": ["Labor Day", "May Day", "International Workers' Day", "Tarptautinė darbo diena", "Darba svētki",
+                   "Święto Pracy", "Día del Trabajador", "Fiesta del Trabajo", "Tag der Arbeit", "Ден на труда"],
+    "Ascension Day": ["Ascension", "Christi Himmelfahrt", "Wniebowstąpienie Pańskie"],
+    "Pentecost": ["Whit Sunday", "Whitsun", "Nelipühade 1. püha", "Zielone Świątki", "Vasarsvētki",
+                  "Pfingstsonntag"],
+    "Whit Monday": ["Pentecost Monday", "Pfingstmontag"],
+    "Corpus Christi": ["Boże Ciało", "Fronleichnam"],
+    "Mother's Day": ["Motinos diena"],
+    "Father's Day": ["Tėvo diena"],
+    "Midsummer Eve": ["Līgo diena", "Līgo Day", "Jaanilaupäev"],
+    "St. John's Day": ["Saint John's Day", "Midsummer Day", "Midsummer", "Joninės", "Rasos", "Jāņi", "Jāņu diena",
+                       "Jaanipäev", "San Juan"],
+    "Assumption Day": ["Assumption", "Assumption of Mary", "Žolinė", "Wniebowzięcie Najświętszej Maryi Panny",
+                       "Asunción de la Virgen", "Mariä Himmelfahrt"],
+    "All Saints' Day": ["All Saints", "Visų šventųjų diena", "Wszystkich Świętych", "Todos los Santos",
+                        "Allerheiligen"],
+    "All Souls' Day": ["Vėlinės", "Mirušiųjų atminimo diena", "Dzień Zaduszny"],
+    "Immaculate Conception": ["Inmaculada Concepción"],
+    "Christmas Eve": ["Kūčios", "Ziemassvētku vakars", "Jõululaupäev", "Wigilia", "Wigilia Bożego Narodzenia",
+                      "Nochebuena", "Heiligabend", "Бъдни вечер"],
+    "Christmas Day": ["Christmas", "Kalėdos", "Pirmoji Kalėdų diena", "Pirmie Ziemassvētki", "Ziemassvētki",
+                      "Esimene jõulupüha", "Boże Narodzenie", "Pierwszy dzień Bożego Narodzenia", "Navidad",
+                      "Weihnachten", "Erster Weihnachtstag", "Коледа", "Krishtlindjet"],
+    "Second Day of Christmas": ["Boxing Day", "St. Stephen's Day", "Saint Stephen's Day", "Antroji Kalėdų diena",
+                                "Otrie Ziemassvētki", "Teine jõulupüha", "Drugi dzień Bożego Narodzenia",
+                                "Zweiter Weihnachtstag"],
+}
+
+
+def normalize(name):
+    # Lower case ASCII-folded words without punctuation or stopwords: "New Year's Day" -> "new year"
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    words = re.findall(r"\w+", text)
+    meaningful = [word for word in words if word not in STOPWORDS]
+    return " ".join(meaningful or words)
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def similarity(left, right):
+    # Similarity of two normalized names, 0..1: the better of word overlap and character trigram overlap,
+    # which tolerates inflections and small spelling differences
+    if left == right:
+        return 1.0
+    left_words, right_words = set(left.split()), set(right.split())
+    words = len(left_words & right_words) / len(left_words | right_words) if left_words and right_words else 0.0
+    left_grams, right_grams = trigrams(left), trigrams(right)
+    grams = 2 * len(left_grams & right_grams) / (len(left_grams) + len(right_grams))
+    return max(words, grams)
+
+
+class HolidayGroup:
+    # Holidays taken to be the same holiday; `canonical` is its alias table name when one matched
+    def __init__(self, canonical=None, country=None):
+        self.canonical = canonical
+        self.country = country  # Set for national holidays, which stay within one country
+        self.holidays = []
+        self.names = set()  # Normalized names of the members
+
+    def add(self, holiday, name):
+        self.holidays.append(holiday)
+        self.names.add(name)
+
+    def merge(self, other):
+        self.holidays.extend(other.holidays)
+        self.names.update(other.names)
+        self.canonical = self.canonical or other.canonical
+
+    def compatible(self, other):
+        # Groups that may never be merged: two different alias table holidays, or national holidays of two countries
+        if self.canonical and other.canonical and self.canonical != other.canonical:
+            return False
+        if (self.country or other.country) and self.country != other.country:
+            return False
+        return True
+
+    def score(self, other):
+        return max(similarity(left, right) for left in self.names for right in other.names)
+
+    def as_dict(self):
+        # {'holiday_name', 'locations'} as used for announcements; each location listed once, in input order
+        locations = []
+        for holiday in self.holidays:
+            if holiday['location_name'] not in locations:
+                locations.append(holiday['location_name'])
+        return {'holiday_name': self.canonical or self.holidays[0]['holiday_name'], 'locations': locations}
+
+
+class HolidayGrouper:
+    # Groups a day's holidays across policies without the LLM: exact matches on normalized names and the alias
+    # table first, then similarity between the remaining groups. Pairs scoring at least match_threshold are
+    # merged, pairs below distinct_threshold are kept apart; anything in between is left for the LLM.
+    def __init__(self, aliases=None, match_threshold=None, distinct_threshold=None):
+        self.match_threshold = float(match_threshold or os.getenv("HOLIDAY_MATCH_THRESHOLD", 0.8))
+        self.distinct_threshold = float(distinct_threshold or os.getenv("HOLIDAY_DISTINCT_THRESHOLD", 0.4))
+        if self.distinct_threshold > self.match_threshold:
+            raise ValueError("HOLIDAY_DISTINCT_THRESHOLD must not exceed HOLIDAY_MATCH_THRESHOLD")
+        aliases = dict(HOLIDAY_ALIASES if aliases is None else aliases)
+        extra = os.getenv("HOLIDAY_ALIASES_FILE")
+        if extra:
+            # {"English name": ["alias", ...]}, added to the built-in table
+            for canonical, names in json.loads(Path(extra).read_text()).items():
+                aliases[canonical] = list(aliases.get(canonical, [])) + list(names)
+        self.aliases = {}
+        for canonical, names in aliases.items():
+            for name in [canonical] + list(names):
+                self.aliases[normalize(name)] = canonical
+
+    def _key(self, holiday):
+        name = normalize(holiday['holiday_name'])
+        canonical = self.aliases.get(name)
+        country = None
+        if canonical is None and NATIONAL_TERMS & set(name.split()):
+            country = holiday.get('location_code') or holiday['location_name']
+        return name, canonical, country
+
+    def group(self, holidays):
+        # Returns (groups, uncertain): settled groups as {'holiday_name', 'locations'} and the HolidayGroups that
+        # resemble another group too much to keep apart and too little to merge
+        groups = {}
+        for holiday in holidays:
+            name, canonical, country = self._key(holiday)
+            key = (canonical or name, country)
+            if key not in groups:
+                groups[key] = HolidayGroup(canonical, country)
+            groups[key].add(holiday, name)
+        groups = list(groups.values())
+
+        # Merge alike groups until no pair reaches the match threshold, strongest pairs first
+        merged = True
+        while merged:
+            merged = False
+            pairs = sorted(((left.score(right), index, other)
+                            for index, left in enumerate(groups)
+                            for other, right in enumerate(groups) if other > index and left.compatible(right)),
+                           reverse=True)
+            for score, index, other in pairs:
+                if score < self.match_threshold:
+                    break
+                groups[index].merge(groups[other])
+                del groups[other]
+                merged = True
+                break
+
+        uncertain = set()
+        for index, left in enumerate(groups):
+            for other, right in enumerate(groups):
+                if other > index and left.compatible(right) and left.score(right) >= self.distinct_threshold:
+                    uncertain.update((index, other))
+        settled = [group.as_dict() for index, group in enumerate(groups) if index not in uncertain]
+        unsettled = [group for index, group in enumerate(groups) if index in uncertain]
+        logger.info(f"Grouped {len(holidays)} holiday(s) locally into {len(settled)} group(s), "
+                    f"{len(unsettled)} group(s) left for the LLM")
+        return settled, unsettled
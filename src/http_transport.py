@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+logger = logging.getLogger(__name__)
+
+# Methods that are safe to repeat after a failure
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Status codes worth retrying for idempotent calls
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class HostStats:
+    # Per-host request counters
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_time = 0.0
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+            "avg_latency": round(self.total_time / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+class HTTPTransport:
+    def __init__(self, connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff_base=None, backoff_max=None, pool_maxsize=None):
+        # Timeouts, retry policy and pool size are configurable through the environment
+        self.connect_timeout = float(connect_timeout or os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+        self.read_timeout = float(read_timeout or os.getenv("HTTP_READ_TIMEOUT", 60))
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv("HTTP_MAX_RETRIES", 3))
+        self.backoff_base = float(backoff_base or os.getenv("HTTP_BACKOFF_BASE", 0.5))
+        self.backoff_max = float(backoff_max or os.getenv("HTTP_BACKOFF_MAX", 10))
+        self.pool_maxsize = int(pool_maxsize or os.getenv("HTTP_POOL_MAXSIZE", 10))
+
+        self._sessions = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        logger.info(f"HTTPTransport initialized with timeouts=({self.connect_timeout}, {self.read_timeout}), "
+                    f"max_retries={self.max_retries}, pool_maxsize={self.pool_maxsize}")
+
+    def _session_for(self, host):
+        # One keep-alive session (and connection pool) per host
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+                self._stats[host] = HostStats()
+                logger.debug(f"Created connection pool for host {host}")
+            return session, self._stats[host]
+
+    def _backoff(self, attempt, response=None):
+        # Honour Retry-After when the server sends it, otherwise use full jitter
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, timeout=None, retries=None, **kwargs):
+        method = method.upper()
+        host = urlsplit(url).netloc
+        session, stats = self._session_for(host)
+        timeout = timeout or (self.connect_timeout, self.read_timeout)
+        if retries is None:
+            retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                with self._lock:
+                    stats.requests += 1
+                    stats.errors += 1
+                    stats.total_time += time.monotonic() - started
+                if attempt >= retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"{method} {url} failed with {e}, retrying in {delay:.2f}s "
+                               f"(attempt {attempt + 1}/{retries})")
+            else:
+                with self._lock:
+                    stats.requests += 1
+                    stats.total_time += time.monotonic() - started
+                    if response.status_code >= 500:
+                        stats.errors += 1
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                    return response
+                delay = self._backoff(attempt, response)
+                response.close()  # Give the connection back to the pool, also for streamed responses
+                logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s "
+                               f"(attempt {attempt + 1}/{retries})")
+
+            with self._lock:
+                stats.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def pool_stats(self):
+        # Request counters and open connection counts for every host seen so far
+        result = {}
+        with self._lock:
+            for host, session in self._sessions.items():
+                host_stats = self._stats[host].as_dict()
+                adapter = session.get_adapter(f"https://{host}")
+                pools = adapter.poolmanager.pools
+                host_stats["pools"] = len(pools)
+                host_stats["connections_opened"] = sum(pools[key].num_connections for key in pools.keys())
+                result[host] = host_stats
+        return result
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._stats.clear()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    # Process-wide transport shared by the OpenAI, PeopleForce and Google Chat clients
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = HTTPTransport()
+    return _transport
@@ -1,13 +1,10 @@
 import sqlite3
 import logging
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from pathlib import Path
 import sys
 import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 # Add the project root directory to the sys.path
 project_root = Path(__file__).resolve().parents[1]
@@ -15,51 +12,161 @@ sys.path.append(str(project_root))
 
 # Import custom modules
 from logging_config import setup_logging
+from config import get_config
 from peopleforce_api import PeopleForceAPI
 from db_functions import create_database
+from import_orchestrator import ImportOrchestrator
+from bulk_writer import BulkWriter
 
-# Setup logging configuration
-setup_logging()
 logger = logging.getLogger(__name__)
 
+# Statements used by the bulk writer, one executemany per table and batch
+LOCATION_INSERT = '''INSERT OR IGNORE INTO Locations (id, name, address, time_zone, holiday_policy_id, created_at, updated_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?)'''
+EMPLOYEE_INSERT = '''INSERT or REPLACE INTO Employees
+                         (id, active, employee_number, full_name, first_name, last_name, email, date_of_birth, gender,
+                            avatar_url, probation_ends_on, hired_on, slack_username, linkedin_url, position_name, 
+                            job_level, division, department, location_id, manager_id, created_at, updated_at, birth_md)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+HOLIDAY_POLICY_INSERT = '''INSERT OR REPLACE INTO HolidayPolicies
+                           (id, name, country_code, created_at, updated_at)
+                           VALUES (?, ?, ?, ?, ?)'''
+HOLIDAY_INSERT = '''INSERT OR REPLACE INTO All_Holidays
+                    (id, name, occurs_on, starts_on, ends_on, is_working, compensated_on, observed_on, holiday_policy_id, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+# Queries run against the database during the import
+SYNC_STATE_SELECT = "SELECT watermark, last_full_sync FROM SyncState WHERE entity = ?"
+SYNC_STATE_UPSERT = '''
+    INSERT INTO SyncState (entity, watermark, last_full_sync, updated_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(entity) DO UPDATE SET
+        watermark = excluded.watermark,
+        last_full_sync = COALESCE(excluded.last_full_sync, SyncState.last_full_sync),
+        updated_at = excluded.updated_at
+'''
+# Delta sync needs every stored updated_at, so this one reads the whole table on purpose
+KNOWN_UPDATED_AT_SELECT = "SELECT id, updated_at FROM Employees"
+# Every employee outside the imported set is checked, so this one also reads the whole table on purpose
+DEACTIVATE_MISSING_UPDATE = '''
+    UPDATE Employees
+    SET active = 0
+    WHERE id NOT IN ({placeholders})
+'''
+
 class PeopleForceDataImporter:
     def __init__(self):
         self.api = PeopleForceAPI()
-        self.db_path = project_root / os.getenv("DB_PATH")
+        self.db_path = project_root / get_config().db_path
         self.imported_employee_ids = set()
+        # Delta sync settings: full resync interval and optional server-side "updated since" filter
+        self.full_resync_days = int(os.getenv("FULL_RESYNC_INTERVAL_DAYS", 7))
+        self.updated_since_param = os.getenv("PEOPLEFORCE_UPDATED_SINCE_PARAM")
+        self.force_full_sync = os.getenv("IMPORT_MODE", "delta").lower() == "full"
+        self.sync_mode = "full"
+        self.employee_watermark = None
+        self.known_updated_at = {}
+        self.sync_stats = {"written": 0, "skipped": 0}
+        self.writer = None
 
     # Parse date string to date object
     def parse_date(self, date_str):
         return datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else None
 
+    # Stage the import run's writes for one transaction at the end; nested calls reuse the open writer
+    @contextmanager
+    def bulk_write(self):
+        if self.writer is not None:
+            yield self.writer
+            return
+        self.writer = BulkWriter(self.db_path)
+        try:
+            with self.writer:
+                yield self.writer
+        finally:
+            self.writer = None
+
+    # Read the stored sync state for an entity
+    def get_sync_state(self, entity):
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(SYNC_STATE_SELECT, (entity,)).fetchone()
+        if not row:
+            return None, None
+        return (datetime.fromisoformat(row[0]) if row[0] else None,
+                datetime.fromisoformat(row[1]) if row[1] else None)
+
+    # Store the sync state for an entity
+    def save_sync_state(self, entity, watermark, full_sync):
+        now = datetime.utcnow()
+        with self.bulk_write() as writer:
+            writer.execute(SYNC_STATE_UPSERT, (entity, watermark, now if full_sync else None, now))
+
+    # Decide between a full and a delta employee sync and prepare the run
+    def begin_employee_sync(self):
+        self.imported_employee_ids = set()
+        self.sync_stats = {"written": 0, "skipped": 0}
+        self.employee_watermark, last_full_sync = self.get_sync_state("employees")
+
+        full_sync_due = (last_full_sync is None or
+                         datetime.utcnow() - last_full_sync >= timedelta(days=self.full_resync_days))
+        if self.force_full_sync or self.employee_watermark is None or full_sync_due:
+            self.sync_mode = "full"
+            self.known_updated_at = {}
+        else:
+            self.sync_mode = "delta"
+            # Remember stored updated_at values so unchanged rows can be skipped
+            with sqlite3.connect(self.db_path) as conn:
+                self.known_updated_at = dict(conn.execute(KNOWN_UPDATED_AT_SELECT))
+        logging.info(f"Employee sync mode: {self.sync_mode} (watermark: {self.employee_watermark})")
+
+    # Finish the employee sync: deactivate missing employees and move the watermark
+    def finish_employee_sync(self):
+        if self.sync_mode == "full" or not self.updated_since_param:
+            # Only a complete employee list can tell which employees are gone
+            self.deactivate_missing_employees()
+        self.save_sync_state("employees", self.employee_watermark, self.sync_mode == "full")
+        self.known_updated_at = {}
+        logging.info(f"Employee sync ({self.sync_mode}) finished: {self.sync_stats['written']} written, "
+                     f"{self.sync_stats['skipped']} unchanged")
+
+    # Stream active employees from Peopleforce API, one record at a time across pages
+    def stream_employees(self, read_ahead=0, executor=None):
+        params = {
+            "status": "active"
+        }
+        if self.sync_mode == "delta" and self.updated_since_param:
+            # Ask PeopleForce only for employees changed since the watermark
+            params[self.updated_since_param] = self.employee_watermark.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+        return self.api.iter_records("employees", params, read_ahead, executor)
+
+    # Buffer one page of employees for the bulk writer, skipping rows that did not change
+    def write_employees(self, employees_data):
+        with self.bulk_write() as writer:
+            for employee in employees_data:
+                updated_at = datetime.strptime(employee['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
+                if self.employee_watermark is None or updated_at > self.employee_watermark:
+                    self.employee_watermark = updated_at
+                if self.known_updated_at.get(employee['id']) == str(updated_at):
+                    self.imported_employee_ids.add(employee['id'])
+                    self.sync_stats["skipped"] += 1
+                    continue
+                self.insert_employee_data(writer, employee)
+                self.sync_stats["written"] += 1
+
     # Get employees from Peopleforce API and import to database
     def import_employees(self):
         create_database()  # Ensure the database is created
-        page = 1
-        total_imported = 0
-
-        while True:
-            params = {
-                "status": "active",
-                "page": page
-            }
-            employees_data = self.api.list_all_employees(params=params).get('data', [])
-            if not employees_data:
-                break  # If there is no more data, exit the loop
+        self.begin_employee_sync()
+        employees = self.stream_employees()
 
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                for employee in employees_data:
-                    self.insert_employee_data(cursor, employee)
-                conn.commit()
-            total_imported += len(employees_data)
-            page += 1  # Go to the next page
-
-        self.deactivate_missing_employees()  # Deactivate employees not in the imported list
-        logging.info(f"Total employees imported: {total_imported}")
-
-    # Insert employee data into the database
-    def insert_employee_data(self, cursor, employee):
+        with self.bulk_write():
+            for batch in employees.batches():
+                self.write_employees(batch)
+            self.finish_employee_sync()  # Deactivate missing employees and store the watermark
+        logging.info(f"Total employees imported: {employees.records} from {employees.pages} page(s)")
+
+    # Buffer employee and location rows in the bulk writer
+    def insert_employee_data(self, writer, employee):
         # Extract dates and convert them to the correct format
         hired_on = self.parse_date(employee['hired_on'])
         probation_ends_on = self.parse_date(employee['probation_ends_on'])
@@ -72,110 +179,96 @@ class PeopleForceDataImporter:
         position_name = employee['position']['name'] if employee.get('position') else None
         job_level = employee['job_level']['name'] if employee.get('job_level') else None
         manager_id = employee['reporting_to']['id'] if employee.get('reporting_to') else None
+        # Precomputed birth month-day ('MM-DD') used by the indexed birthday lookup
+        birth_md = employee['date_of_birth'][5:10] if employee.get('date_of_birth') else None
 
         # Extract location information
         location = employee.get('location')
         location_id = None
         if location:
-            cursor.execute('''INSERT OR IGNORE INTO Locations (id, name, address, time_zone, holiday_policy_id, created_at, updated_at)
-                              VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                           (location['id'], location['name'], location['address'], location['time_zone'],
-                            location['holiday_policy_id'], 
-                            datetime.strptime(location['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ'),
-                            datetime.strptime(location['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')))
+            # Locations are shared by many employees, the writer keeps only the first row per id
+            writer.add('Locations', LOCATION_INSERT,
+                       (location['id'], location['name'], location['address'], location['time_zone'],
+                        location['holiday_policy_id'], 
+                        datetime.strptime(location['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ'),
+                        datetime.strptime(location['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')),
+                       key=location['id'])
             location_id = location['id']
 
-        # Insert employee data into the database
-        cursor.execute('''INSERT or REPLACE INTO Employees
-                              (id, active, employee_number, full_name, first_name, last_name, email, date_of_birth, gender,
-                                 avatar_url, probation_ends_on, hired_on, slack_username, linkedin_url, position_name, 
-                                 job_level, division, department, location_id, manager_id, created_at, updated_at)
-                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                       (employee['id'], employee['active'], employee['employee_number'], employee['full_name'],
-                        employee['first_name'], employee['last_name'], employee['email'], employee['date_of_birth'],
-                        employee['gender'], employee['avatar_url'], probation_ends_on, hired_on,
-                        employee['slack_username'], employee['linkedin_url'], position_name, job_level,
-                        division_name, department_name, location_id, manager_id, created_at, updated_at))
+        # Buffer employee data for the database
+        writer.add('Employees', EMPLOYEE_INSERT,
+                   (employee['id'], employee['active'], employee['employee_number'], employee['full_name'],
+                    employee['first_name'], employee['last_name'], employee['email'], employee['date_of_birth'],
+                    employee['gender'], employee['avatar_url'], probation_ends_on, hired_on,
+                    employee['slack_username'], employee['linkedin_url'], position_name, job_level,
+                    division_name, department_name, location_id, manager_id, created_at, updated_at, birth_md))
         self.imported_employee_ids.add(employee['id'])
 
     # Function to deactivate missing employees
     def deactivate_missing_employees(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self.bulk_write() as writer:
             # Create a string with placeholders for the imported employee IDs
             placeholders = ', '.join('?' for _ in self.imported_employee_ids)
             # Deactivate employees that are not in the imported list
-            cursor.execute(f'''
-                UPDATE Employees
-                SET active = 0
-                WHERE id NOT IN ({placeholders})
-            ''', tuple(self.imported_employee_ids))
-            conn.commit()
+            writer.execute(DEACTIVATE_MISSING_UPDATE.format(placeholders=placeholders),
+                           tuple(self.imported_employee_ids))
 
-    # Import holiday policies from Peopleforce API
-    def import_holiday_policies_from_api(self):
-        holiday_policies = self.api.list_all_holiday_policies()
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            for policy in holiday_policies['data']:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO HolidayPolicies
-                    (id, name, country_code, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
+    # Buffer holiday policies for the bulk writer
+    def write_holiday_policies(self, policies):
+        with self.bulk_write() as writer:
+            for policy in policies:
+                writer.add('HolidayPolicies', HOLIDAY_POLICY_INSERT, (
                     policy['id'],
                     policy['name'],
                     policy['country_code'],
                     datetime.strptime(policy['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ'),
                     datetime.strptime(policy['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
                 ))
-            conn.commit()
+
+    # Import holiday policies from Peopleforce API
+    def import_holiday_policies_from_api(self):
+        holiday_policies = self.api.list_all_holiday_policies()
+        self.write_holiday_policies(holiday_policies['data'])
+
+    # Stream holidays from Peopleforce API, one record at a time across pages
+    def stream_holidays(self, read_ahead=0, executor=None):
+        return self.api.iter_records("holidays", None, read_ahead, executor)
+
+    # Buffer one page of holidays for the bulk writer
+    def write_holidays(self, holidays):
+        with self.bulk_write() as writer:
+            for holiday in holidays:
+                writer.add('All_Holidays', HOLIDAY_INSERT, (
+                    holiday['id'],
+                    holiday['name'],
+                    holiday['occurs_on'],
+                    holiday['starts_on'],
+                    holiday['ends_on'],
+                    not holiday['working'],  # Convert working to is_working, where True means a working day
+                    holiday['compensated_on'],
+                    holiday['observed_on'],
+                    holiday['holiday_policy_id'],
+                    datetime.strptime(holiday['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ'),
+                    datetime.strptime(holiday['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
+                ))
 
     # Import all holidays from Peopleforce API
     def import_all_holidays_from_api(self):
-        page = 1
-        total_imported = 0
-
-        while True:
-            all_holidays = self.api.list_all_holidays(page=page)
-            if not all_holidays['data']:
-                break  # If there is no more data, exit the loop
+        holidays = self.stream_holidays()
 
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                for holiday in all_holidays['data']:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO All_Holidays
-                        (id, name, occurs_on, starts_on, ends_on, is_working, compensated_on, observed_on, holiday_policy_id, created_at, updated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        holiday['id'],
-                        holiday['name'],
-                        holiday['occurs_on'],
-                        holiday['starts_on'],
-                        holiday['ends_on'],
-                        not holiday['working'],  # Convert working to is_working, where True means a working day
-                        holiday['compensated_on'],
-                        holiday['observed_on'],
-                        holiday['holiday_policy_id'],
-                        datetime.strptime(holiday['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ'),
-                        datetime.strptime(holiday['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
-                    ))
-            conn.commit()
-            total_imported += len(all_holidays['data'])
-            page += 1  # Go to the next page
-        print(f"Total holidays imported: {total_imported}")
+        with self.bulk_write():
+            for batch in holidays.batches():
+                self.write_holidays(batch)
+        logging.info(f"Total holidays imported: {holidays.records}")
 
     def update_data_from_api(self):
-        # Update employees
-        self.import_employees()
-        # Update holiday policies
-        self.import_holiday_policies_from_api()
-        # Update all holidays
-        self.import_all_holidays_from_api()
+        # Fetch employees, holiday policies and holidays concurrently, write them in a fixed order
+        timings = ImportOrchestrator(self).run()
         logging.info("Data update from PeopleForce API completed successfully")
+        return timings
 
 if __name__ == '__main__':
+    setup_logging()
     importer = PeopleForceDataImporter()
     importer.import_employees()
     importer.import_holiday_policies_from_api()
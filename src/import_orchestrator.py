@@ -0,0 +1,167 @@
+import os
+import sys
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from db_functions import create_database
+
+logger = logging.getLogger(__name__)
+
+# Marker put on an endpoint queue once its last page was fetched
+_DONE = object()
+
+
+class EndpointTiming:
+    # Fetch/write timing and volume for one endpoint of an import run
+    def __init__(self, name):
+        self.name = name
+        self.pages = 0
+        self.records = 0
+        self.fetch_seconds = 0.0
+        self.write_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "pages": self.pages,
+            "records": self.records,
+            "fetch_seconds": round(self.fetch_seconds, 3),
+            "write_seconds": round(self.write_seconds, 3),
+        }
+
+
+class ImportOrchestrator:
+    def __init__(self, importer, max_in_flight=None, prefetch_pages=None):
+        self.importer = importer
+        # Total number of concurrent API requests across all endpoints
+        self.max_in_flight = max(1, int(max_in_flight or os.getenv("IMPORT_MAX_IN_FLIGHT", 6)))
+        # Number of pages requested ahead of the writer for each paginated endpoint
+        self.prefetch_pages = max(1, int(prefetch_pages or os.getenv("IMPORT_PREFETCH_PAGES", 3)))
+        self._stop = threading.Event()
+        self._failure = None  # First fetch error, raised by the writer once the import is stopped
+
+    def _put(self, out, item):
+        # The queue is bounded; give up once the import is stopped so a blocked producer can exit
+        while not self._stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _produce(self, name, stream, out, timing):
+        # Stream the records of one endpoint and hand them to the writer in batches through a queue
+        started = time.monotonic()
+        try:
+            for batch in stream.batches():
+                if self._stop.is_set():
+                    break
+                self._put(out, batch)
+        except Exception as e:
+            logger.error(f"Fetching {name} failed: {e}", exc_info=True)
+            self._failure = self._failure or e
+            self._put(out, e)
+            self._stop.set()
+        finally:
+            timing.fetch_seconds = time.monotonic() - started
+            timing.pages = stream.pages
+            self._put(out, _DONE)
+
+    @staticmethod
+    def _fetch_once(fetch, timing):
+        # Fetch an unpaginated endpoint and record how long it took
+        started = time.monotonic()
+        try:
+            return fetch()
+        finally:
+            timing.fetch_seconds = time.monotonic() - started
+
+    def _consume(self, name, source, write, timing):
+        # Write pages of one endpoint in the order they were fetched. Once the import is stopped producers no
+        # longer queue anything, not even _DONE, so an empty queue then means this endpoint will never finish
+        while True:
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise self._failure or RuntimeError(f"Import stopped before all {name} were fetched")
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            started = time.monotonic()
+            write(item)
+            timing.write_seconds += time.monotonic() - started
+            timing.records += len(item)
+
+    def run(self):
+        importer = self.importer
+        create_database()  # Ensure the database is created
+        importer.begin_employee_sync()  # Decide between full and delta employee sync
+        self._stop.clear()
+        self._failure = None
+        started = time.monotonic()
+
+        timings = {name: EndpointTiming(name) for name in ("employees", "holiday_policies", "holidays")}
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="import-fetch") as pool:
+            # Paginated endpoints, each streamed by its own producer with pages requested ahead on the shared pool
+            paginated = [
+                ("employees", importer.stream_employees(self.prefetch_pages, pool)),
+                ("holidays", importer.stream_holidays(self.prefetch_pages, pool)),
+            ]
+            # Bounded queues keep memory flat when fetching is faster than writing
+            queues = {name: queue.Queue(maxsize=self.prefetch_pages) for name, _ in paginated}
+
+            # Holiday policies are a single unpaginated request
+            policies_timing = timings["holiday_policies"]
+            policies_future = pool.submit(self._fetch_once, importer.api.list_all_holiday_policies, policies_timing)
+
+            producers = [
+                threading.Thread(target=self._produce, args=(name, stream, queues[name], timings[name]),
+                                 name=f"import-{name}", daemon=True)
+                for name, stream in paginated
+            ]
+            for producer in producers:
+                producer.start()
+
+            try:
+                # Writes always happen in this order: employees, holiday policies, holidays. They are staged
+                # while fetching and committed in one short transaction so readers never see a half-imported run
+                with importer.bulk_write() as writer:
+                    self._consume("employees", queues["employees"], importer.write_employees, timings["employees"])
+                    importer.finish_employee_sync()  # Deactivate missing employees and store the watermark
+
+                    policies = policies_future.result()['data']
+                    write_started = time.monotonic()
+                    importer.write_holiday_policies(policies)
+                    policies_timing.write_seconds = time.monotonic() - write_started
+                    policies_timing.pages = 1
+                    policies_timing.records = len(policies)
+
+                    self._consume("holidays", queues["holidays"], importer.write_holidays, timings["holidays"])
+                write_stats = writer.stats()
+            except Exception:
+                self._stop.set()
+                raise
+            finally:
+                for producer in producers:
+                    producer.join()
+
+        report = {name: timing.as_dict() for name, timing in timings.items()}
+        report["writer"] = write_stats
+        report["total_seconds"] = round(time.monotonic() - started, 3)
+        for name, timing in timings.items():
+            logger.info(f"Imported {timing.records} {name} records from {timing.pages} page(s): "
+                        f"fetch {timing.fetch_seconds:.2f}s, write {timing.write_seconds:.2f}s")
+        logger.info(f"Import finished in {report['total_seconds']:.2f}s")
+        return report
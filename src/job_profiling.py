@@ -0,0 +1,153 @@
+import os
+import io
+import sys
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+PROFILED_JOBS = ("daily_data_update", "birthday_wish_job", "public_holiday_message_job")
+
+
+def parse_requests(value):
+    # "daily_data_update:3,birthday_wish_job" -> {"daily_data_update": 3, "birthday_wish_job": 1}
+    requests = {}
+    for item in (value or "").split(","):
+        job_id, _, runs = item.strip().partition(":")
+        if not job_id:
+            continue
+        if job_id not in PROFILED_JOBS:
+            logger.warning(f"Ignoring profiling request for unknown job {job_id}")
+            continue
+        requests[job_id] = int(runs) if runs else 1
+    return requests
+
+
+class JobProfiler:
+    # Wraps the next N runs of a requested job in cProfile and tracemalloc; does nothing unless asked to
+    def __init__(self, requests=None, output_dir=None, top=None, frames=None):
+        self.pending = parse_requests(os.getenv("JOB_PROFILE")) if requests is None else dict(requests)
+        self.output_dir = Path(output_dir or os.getenv("JOB_PROFILE_DIR", project_root / 'app' / 'profiles'))
+        self.top = top or int(os.getenv("JOB_PROFILE_TOP", 25))
+        self.frames = frames or int(os.getenv("JOB_PROFILE_TRACEMALLOC_FRAMES", 10))
+        self._lock = threading.Lock()
+        # cProfile allows one active profiler per process and tracemalloc is global, so profiled runs never overlap
+        self._active = threading.Lock()
+        if self.pending:
+            logger.info(f"Job profiling requested: {self.pending}")
+
+    def request(self, job_id, runs=1):
+        # Profile the next `runs` runs of job_id, replacing any earlier request for it
+        if job_id not in PROFILED_JOBS:
+            raise ValueError(f"Unknown job {job_id}, expected one of {', '.join(PROFILED_JOBS)}")
+        if runs < 0:
+            raise ValueError("runs must not be negative")
+        with self._lock:
+            if runs:
+                self.pending[job_id] = runs
+            else:
+                self.pending.pop(job_id, None)
+        logger.info(f"Profiling of the next {runs} run(s) of {job_id} requested")
+
+    def requested(self):
+        with self._lock:
+            return dict(self.pending)
+
+    def _claim(self, job_id):
+        # Take one run off the job's request, if any
+        with self._lock:
+            runs = self.pending.get(job_id)
+            if not runs:
+                return False
+            if runs == 1:
+                del self.pending[job_id]
+            else:
+                self.pending[job_id] = runs - 1
+            return True
+
+    def _unclaim(self, job_id):
+        with self._lock:
+            self.pending[job_id] = self.pending.get(job_id, 0) + 1
+
+    @contextmanager
+    def profile(self, job_id):
+        if not self.pending or not self._claim(job_id):
+            yield
+            return
+        if not self._active.acquire(blocking=False):
+            # Another job is being profiled; keep the request for the next run
+            self._unclaim(job_id)
+            logger.warning(f"Not profiling {job_id}, another job is being profiled")
+            yield
+            return
+        try:
+            profiler = cProfile.Profile()
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start(self.frames)
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                if started_tracing:
+                    tracemalloc.stop()
+                try:
+                    self._write(job_id, profiler, snapshot, peak)
+                except Exception as e:
+                    logger.error(f"Failed to write the profile of {job_id}: {e}", exc_info=True)
+        finally:
+            self._active.release()
+
+    def _write(self, job_id, profiler, snapshot, peak):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = self.output_dir / f"{job_id}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}"
+        stats_path = base.with_suffix(".pstats")
+        snapshot_path = base.with_suffix(".tracemalloc")
+        profiler.dump_stats(stats_path)
+        snapshot.dump(str(snapshot_path))
+
+        # cProfile only sees the job's own thread; time spent in generation workers shows up as waiting
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        allocations = "\n".join(str(stat) for stat in snapshot.statistics("lineno")[:self.top])
+        logger.info(f"Profile of {job_id} written to {stats_path} and {snapshot_path}, "
+                    f"peak traced memory {peak / 1024 / 1024:.1f} MiB\n"
+                    f"Top {self.top} functions by cumulative time:\n{stream.getvalue()}"
+                    f"Top {self.top} allocation sites still held at the end of the run:\n{allocations}")
+
+
+_job_profiler = None
+_job_profiler_lock = threading.Lock()
+
+
+def get_job_profiler():
+    global _job_profiler
+    with _job_profiler_lock:
+        if _job_profiler is None:
+            get_config()  # Make sure the .env file is loaded before JOB_PROFILE is read
+            _job_profiler = JobProfiler()
+        return _job_profiler
+
+
+def profile_job(job_id):
+    return get_job_profiler().profile(job_id)
@@ -0,0 +1,98 @@
+import json
+import codecs
+import logging
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class _TextBuffer:
+    # Decoded text of a byte stream, read chunk by chunk as the parser needs it
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        # Append the next chunk; False once the stream is exhausted
+        if self.eof:
+            return False
+        if self.pos:
+            # Drop text that was already parsed so the buffer stays about one chunk long
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.text += self._utf8.decode(chunk)
+                return True
+        self.text += self._utf8.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def peek(self):
+        # Next character that is not whitespace, or None at the end of the stream
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return None
+
+    def take(self, expected):
+        char = self.peek()
+        if char is None or char not in expected:
+            raise ValueError(f"Malformed JSON stream: expected one of {expected!r}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        # Decode one complete JSON value, reading more of the stream until it is all buffered
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.text) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+class StreamedDocument:
+    # A JSON object decoded while it is read: items of the array under `key` are yielded one at a time,
+    # every other top-level value is kept in `fields` (complete once iteration has finished)
+    def __init__(self, chunks, key="data"):
+        self.key = key
+        self.fields = {}
+        self._buffer = _TextBuffer(chunks)
+
+    def __iter__(self):
+        buffer = self._buffer
+        buffer.take('{')
+        if buffer.peek() == '}':
+            return
+        while True:
+            name = buffer.value()
+            buffer.take(':')
+            if name == self.key and buffer.peek() == '[':
+                buffer.take('[')
+                if buffer.peek() == ']':
+                    buffer.take(']')
+                else:
+                    while True:
+                        yield buffer.value()
+                        if buffer.take(',]') == ']':
+                            break
+            else:
+                self.fields[name] = buffer.value()
+            if buffer.take(',}') == '}':
+                return
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import uuid
+import socket
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from metrics import LEADER_STATUS, LEADER_TOKEN
+
+logger = logging.getLogger(__name__)
+
+# Take the lease if it is free, expired or already ours. The fencing token grows with every new term,
+# so work started under an older term can be told apart from the current leader's.
+LEASE_ACQUIRE = '''
+    INSERT INTO LeaderLease (name, holder, token, expires_at, renewed_at)
+    VALUES (?, ?, 1, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET
+        holder = excluded.holder,
+        token = CASE WHEN LeaderLease.holder = excluded.holder AND LeaderLease.expires_at > excluded.renewed_at
+                     THEN LeaderLease.token ELSE LeaderLease.token + 1 END,
+        expires_at = excluded.expires_at,
+        renewed_at = excluded.renewed_at
+    WHERE LeaderLease.holder = excluded.holder OR LeaderLease.expires_at <= excluded.renewed_at
+'''
+LEASE_SELECT = "SELECT holder, token, expires_at FROM LeaderLease WHERE name = ?"
+LEASE_RELEASE = "UPDATE LeaderLease SET expires_at = 0 WHERE name = ? AND holder = ?"
+
+
+class LeaseLost(Exception):
+    # Raised when a write is attempted under a lease this process no longer holds
+    pass
+
+
+class LeaderLease:
+    # Lease-based leader election through the shared database. The holder renews every renew_interval;
+    # if it stops, another replica takes over once the ttl has passed, so failover takes at most
+    # ttl + renew_interval.
+    def __init__(self, db_connection, name="scheduler", ttl=None, renew_interval=None, holder=None):
+        self.db = db_connection
+        self.name = name
+        self.ttl = float(ttl or os.getenv("LEADER_LEASE_TTL", 30))
+        self.renew_interval = float(renew_interval or os.getenv("LEADER_RENEW_INTERVAL", 10))
+        if self.renew_interval >= self.ttl:
+            raise ValueError("LEADER_RENEW_INTERVAL must be shorter than LEADER_LEASE_TTL")
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.token = None
+        self._valid_until = 0.0  # Monotonic deadline after which we stop acting as leader
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._job = threading.local()  # Token a running job was started under
+
+    def try_acquire(self):
+        # Acquire or renew the lease; returns True while this process is the leader
+        started = time.monotonic()
+        now = time.time()
+        try:
+            with self.db.connection() as conn:
+                conn.execute(LEASE_ACQUIRE, (self.name, self.holder, now + self.ttl, now))
+                row = conn.execute(LEASE_SELECT, (self.name,)).fetchone()
+        except Exception as e:
+            logger.error(f"Leader lease renewal failed: {e}")
+            row = None
+
+        with self._lock:
+            was_leader = self.token is not None
+            if row is not None and row['holder'] == self.holder:
+                if self.token != row['token']:
+                    logger.info(f"Became leader ({self.holder}) with fencing token {row['token']}")
+                self.token = row['token']
+                # Measured from before the write, so we give up before any other replica can take over
+                self._valid_until = started + self.ttl
+            elif was_leader and (row is not None or time.monotonic() >= self._valid_until):
+                logger.warning(f"Lost leadership ({self.holder}), "
+                               f"lease held by {row['holder'] if row is not None else 'unknown'}")
+                self.token = None
+            is_leader = self.token is not None and time.monotonic() < self._valid_until
+        LEADER_STATUS.labels(lease=self.name).set(1 if is_leader else 0)
+        if is_leader:
+            LEADER_TOKEN.labels(lease=self.name).set(self.token)
+        return is_leader
+
+    def is_leader(self):
+        with self._lock:
+            return self.token is not None and time.monotonic() < self._valid_until
+
+    def current_token(self):
+        with self._lock:
+            return self.token if self.token is not None and time.monotonic() < self._valid_until else None
+
+    @contextmanager
+    def term(self):
+        # Run a job under the current token; its fenced writes fail once a newer term has begun
+        previous = getattr(self._job, 'token', None)
+        self._job.token = self.current_token()
+        try:
+            yield self._job.token
+        finally:
+            self._job.token = previous
+
+    def fence(self, conn):
+        # Call after a write, inside its transaction: the write lock is held, so the lease cannot change
+        # underneath; raises LeaseLost (rolling the write back) unless the lease still has our token
+        token = getattr(self._job, 'token', None) or self.current_token()
+        row = conn.execute(LEASE_SELECT, (self.name,)).fetchone()
+        if token is None or row is None or row['holder'] != self.holder or row['token'] != token:
+            raise LeaseLost(f"Lease {self.name} is no longer held with token {token}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self.try_acquire()  # Decide right away, before the first job can fire
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="leader-lease", daemon=True)
+            self._thread.start()
+            logger.info(f"Leader election started for {self.holder}: ttl {self.ttl}s, "
+                        f"renewal every {self.renew_interval}s")
+
+    def _run(self):
+        while not self._stop.wait(self.renew_interval):
+            self.try_acquire()
+
+    def stop(self, release=True):
+        # Stop renewing; releasing lets another replica take over without waiting for the ttl
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.renew_interval)
+        if release:
+            with self._lock:
+                self.token = None
+            try:
+                self.db.execute(LEASE_RELEASE, (self.name, self.holder))
+                logger.info(f"Released leader lease {self.name}")
+            except Exception as e:
+                logger.error(f"Failed to release leader lease: {e}")
+        LEADER_STATUS.labels(lease=self.name).set(0)
+
+
+def leader_only(lease, job_id, func):
+    # Wrap a scheduled job so that it only runs on the lease holder; other replicas skip it
+    if lease is None:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not lease.is_leader():
+            logger.info(f"Skipping {job_id}, this replica is not the leader")
+            return None
+        with lease.term():
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from db_functions import DBConnection
+from config import get_config
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+# Default time-to-live per use case, in seconds. Holiday responses are reused by pregeneration, reruns and
+# timezone groups; they expire well within a year, so next year's holiday gets fresh text
+DEFAULT_TTLS = {
+    "holiday_similarity": 30 * DAY,
+    "holiday_message": 30 * DAY,
+    "holiday_announcements": 30 * DAY,
+}
+
+CACHE_ENTRY_SELECT = "SELECT response, expires_at FROM LLMCache WHERE key = ?"
+CACHE_ENTRY_TOUCH = "UPDATE LLMCache SET last_access = ?, hits = hits + 1 WHERE key = ?"
+CACHE_ENTRY_INSERT = '''
+    INSERT OR REPLACE INTO LLMCache (key, use_case, response, created_at, expires_at, last_access, hits)
+    VALUES (?, ?, ?, ?, ?, ?, 0)
+'''
+EXPIRED_ENTRIES_DELETE = "DELETE FROM LLMCache WHERE expires_at <= ?"
+ENTRY_COUNT_SELECT = "SELECT COUNT(*) AS count FROM LLMCache"
+LEAST_RECENTLY_USED_DELETE = '''
+    DELETE FROM LLMCache WHERE key IN (
+        SELECT key FROM LLMCache ORDER BY last_access LIMIT ?)
+'''
+
+
+def _parse_ttls(value):
+    # Parse "use_case=seconds,use_case=seconds" into a dict
+    ttls = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, seconds = item.partition("=")
+        ttls[name.strip()] = int(seconds)
+    return ttls
+
+
+def cache_key(model, temperature, messages, response_format=None):
+    # Stable key for the normalized (model, temperature, messages) tuple, plus the output format when one is requested
+    normalized = {
+        "model": model.strip().lower(),
+        "temperature": round(float(temperature), 3),
+        "messages": [
+            {"role": message["role"], "content": " ".join(str(message["content"]).split())}
+            for message in messages
+        ],
+    }
+    if response_format is not None:
+        normalized["response_format"] = response_format
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, db_path=None, max_entries=None, default_ttl=None):
+        # Cached responses live in their own SQLite file next to the app database
+        default_path = Path(get_config().db_path).parent / "llm_cache.db"
+        self.db = DBConnection(db_path or os.getenv("LLM_CACHE_DB_PATH", default_path))
+        self.max_entries = int(max_entries or os.getenv("LLM_CACHE_MAX_ENTRIES", 1000))
+        self.default_ttl = int(default_ttl or os.getenv("LLM_CACHE_DEFAULT_TTL", 30 * DAY))
+        self.ttls = {**DEFAULT_TTLS, **_parse_ttls(os.getenv("LLM_CACHE_TTLS"))}
+        # Use cases that must never be served from the cache, e.g. birthday wishes where variety is wanted
+        self.opt_out = {name.strip() for name in os.getenv("LLM_CACHE_OPT_OUT", "birthday_wish").split(",") if name.strip()}
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.db.execute('''
+            CREATE TABLE IF NOT EXISTS LLMCache (
+                key TEXT PRIMARY KEY,
+                use_case TEXT,
+                response TEXT,
+                created_at REAL,
+                expires_at REAL,
+                last_access REAL,
+                hits INTEGER DEFAULT 0)
+        ''')
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON LLMCache (last_access)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON LLMCache (expires_at)")
+        logger.info(f"LLMCache initialized at {self.db.db_path} with max_entries={self.max_entries}, "
+                    f"opt_out={sorted(self.opt_out)}")
+
+    def enabled_for(self, use_case):
+        return use_case is not None and use_case not in self.opt_out
+
+    def ttl_for(self, use_case):
+        return self.ttls.get(use_case, self.default_ttl)
+
+    def get(self, key):
+        now = time.time()
+        rows = self.db.execute(CACHE_ENTRY_SELECT, (key,))
+        if not rows or rows[0]['expires_at'] <= now:
+            with self._lock:
+                self.misses += 1
+            return None
+        self.db.execute(CACHE_ENTRY_TOUCH, (now, key))
+        with self._lock:
+            self.hits += 1
+        return json.loads(rows[0]['response'])
+
+    def set(self, key, use_case, response):
+        now = time.time()
+        self.db.execute(CACHE_ENTRY_INSERT, (key, use_case, json.dumps(response), now, now + self.ttl_for(use_case), now))
+        self.evict()
+
+    def evict(self):
+        # Drop expired entries, then the least recently used ones above the size cap
+        self.db.execute(EXPIRED_ENTRIES_DELETE, (time.time(),))
+        count = self.db.execute(ENTRY_COUNT_SELECT)[0]['count']
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.db.execute(LEAST_RECENTLY_USED_DELETE, (overflow,))
+            logger.debug(f"Evicted {overflow} least recently used LLM cache entries")
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": self.db.execute(ENTRY_COUNT_SELECT)[0]['count'],
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    # Process-wide cache, created on first use
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
@@ -0,0 +1,142 @@
+import os
+import sys
+import logging
+import threading
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+logger = logging.getLogger(__name__)
+
+LOCATION_TIME_ZONES_SELECT = "SELECT DISTINCT time_zone FROM Locations"
+# A run is claimed once per job, zone and local date; an unfinished claim older than the claim timeout belongs
+# to a run that died (e.g. its process was restarted) and is claimed again
+ZONE_DELIVERY_CLAIM = '''
+    INSERT INTO ZoneDeliveries (job, time_zone, local_date, started_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (job, time_zone, local_date) DO UPDATE SET started_at = excluded.started_at
+    WHERE ZoneDeliveries.finished_at IS NULL AND ZoneDeliveries.started_at < ?
+'''
+ZONE_DELIVERY_FINISH = '''
+    UPDATE ZoneDeliveries SET finished_at = ?
+    WHERE job = ? AND time_zone = ? AND local_date = ?
+'''
+
+
+def parse_local_time(value):
+    # 'HH:MM' -> datetime.time
+    hour, minute = value.split(':')
+    return time(int(hour), int(minute))
+
+
+class TimeZoneGroup:
+    # Locations sharing one timezone; `names` are the Locations.time_zone values that resolved to it
+    def __init__(self, key, zone, names, is_default=False):
+        self.key = key
+        self.zone = zone
+        self.names = set(names)
+        self.is_default = is_default
+
+    def contains(self, time_zone):
+        # Whether an employee or holiday policy with this Locations.time_zone belongs to the group;
+        # a missing or empty time_zone belongs to the default group
+        if not time_zone:
+            return self.is_default
+        return time_zone in self.names
+
+    def __repr__(self):
+        return f"TimeZoneGroup({self.key}, {len(self.names)} name(s){', default' if self.is_default else ''})"
+
+
+class LocalDeliveryScheduler:
+    # Runs daily jobs at a local time in every timezone that has locations. One scheduler job calls tick()
+    # every minute, so the number of cron jobs does not grow with the number of locations or zones.
+    def __init__(self, db_connection, default_time_zone="UTC", window_minutes=180, fence=None, claim_timeout=None):
+        self.db = db_connection
+        self.fence = fence  # Checked inside the claim transaction, e.g. that we still hold the leader lease
+        self.default_time_zone = default_time_zone
+        self.default_zone = ZoneInfo(default_time_zone)
+        self.window = timedelta(minutes=window_minutes)
+        # Seconds after which an unfinished run is taken to have died and may run again within the window
+        self.claim_timeout = float(claim_timeout or os.getenv("LOCAL_DELIVERY_CLAIM_TIMEOUT", 900))
+        self.jobs = {}  # job_id -> (local time, func(local_date, group))
+        self._unknown_zones = set()  # Reported once each, not on every tick
+        self._lock = threading.Lock()
+
+    def add_job(self, job_id, local_time, func):
+        self.jobs[job_id] = (parse_local_time(local_time) if isinstance(local_time, str) else local_time, func)
+        logger.info(f"{job_id} runs at {self.jobs[job_id][0].strftime('%H:%M')} local time in every timezone group")
+
+    def zone_groups(self):
+        # Group the distinct Locations.time_zone values by the zone they resolve to; unknown ones use the default
+        groups = {self.default_time_zone: TimeZoneGroup(self.default_time_zone, self.default_zone,
+                                                        [self.default_time_zone], is_default=True)}
+        for row in self.db.execute(LOCATION_TIME_ZONES_SELECT):
+            name = row['time_zone']
+            if not name:
+                continue  # Missing or empty: contains() puts these locations in the default group
+            try:
+                zone = ZoneInfo(name)
+                key = zone.key
+            except (ZoneInfoNotFoundError, ValueError):
+                if name not in self._unknown_zones:
+                    self._unknown_zones.add(name)
+                    logger.warning(f"Unknown time zone {name!r}, using {self.default_time_zone} for its locations")
+                key = self.default_time_zone
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = TimeZoneGroup(key, zone, [])
+            group.names.add(name)
+        return list(groups.values())
+
+    def _claim(self, job_id, group, local_date):
+        # At most one finished run per job, zone and local date, also across restarts and instances
+        now = datetime.utcnow()
+        stale_before = (now - timedelta(seconds=self.claim_timeout)).isoformat()
+        with self.db.connection() as conn:
+            claimed = conn.execute(ZONE_DELIVERY_CLAIM, (job_id, group.key, local_date, now.isoformat(),
+                                                         stale_before)).rowcount
+            if self.fence is not None:
+                self.fence(conn)
+            return bool(claimed)
+
+    def _finish(self, job_id, group, local_date):
+        self.db.execute(ZONE_DELIVERY_FINISH, (datetime.utcnow().isoformat(), job_id, group.key, local_date))
+
+    def due(self, now=None):
+        # (job_id, group, local_date) for every group whose local send time passed within the window
+        now = now or datetime.now(timezone.utc)
+        groups = self.zone_groups()
+        due = []
+        for job_id, (local_time, _) in self.jobs.items():
+            for group in groups:
+                local_now = now.astimezone(group.zone)
+                send_at = datetime.combine(local_now.date(), local_time, tzinfo=group.zone)
+                if send_at <= local_now < send_at + self.window:
+                    due.append((job_id, group, local_now.strftime('%Y-%m-%d')))
+        return due
+
+    def tick(self, now=None):
+        # Run every due job for every group that has not had it for its local date yet
+        if not self._lock.acquire(blocking=False):
+            return 0  # The previous tick is still running jobs
+        try:
+            ran = 0
+            for job_id, group, local_date in self.due(now):
+                if not self._claim(job_id, group, local_date):
+                    continue
+                logger.info(f"Running {job_id} for {group} on local date {local_date}")
+                try:
+                    self.jobs[job_id][1](local_date, group)
+                    ran += 1
+                except Exception as e:
+                    logger.error(f"{job_id} failed for {group}: {e}", exc_info=True)
+                # Only a run that got this far counts; one cut short by a crash is claimed again once stale
+                self._finish(job_id, group, local_date)
+            return ran
+        finally:
+            self._lock.release()
@@ -1,5 +1,6 @@
 import logging
-from dotenv import load_dotenv, dotenv_values
+import logging.handlers
+from dotenv import dotenv_values
 import os
 from pathlib import Path
 import sys
@@ -7,15 +8,18 @@ import sys
 # Set the project root directory
 project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
-load_dotenv()  # Load environment variables from .env file
+
+from config import get_config
 
 logging_initialized = False
 
 def setup_logging():
+    # Called by entry points only; importing a module never configures logging
     global logging_initialized
     if not logging_initialized:
-        # Get log level from environment variable, default to 'DEBUG'
-        log_level = os.getenv('LOG_LEVEL', 'DEBUG').upper()
+        config = get_config()
+        # Get log level from the configuration, default to 'DEBUG'
+        log_level = config.log_level
         # Create log directory in the project root or /app/logs/
         log_dir = os.path.join(project_root, 'app', 'logs')
         os.makedirs(log_dir, exist_ok=True)  # Ensure the log directory exists
@@ -25,7 +29,10 @@ def setup_logging():
         logging.basicConfig(
             level=getattr(logging, log_level),
             handlers=[
-                logging.FileHandler(log_file, mode='w'),  # Log to file
+                # Log to file, rotated so it stays within LOG_FILE_MAX_BYTES x (LOG_FILE_BACKUPS + 1)
+                logging.handlers.RotatingFileHandler(log_file, mode=config.log_file_mode,
+                                                     maxBytes=config.log_file_max_bytes,
+                                                     backupCount=config.log_file_backups),
                 logging.StreamHandler()  # Log to console
             ],
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -36,12 +43,9 @@ def reload_env_and_logging():
     # Load new values from .env file
     env_path = os.path.join(os.path.dirname(__file__), '..', '..', '.env')  # Path to your .env file
     new_env = dotenv_values(env_path)
-    
+
     # Update environment variables
     os.environ.update(new_env)
-    
+
     # Reinitialize logging
     setup_logging()
-
-# Call the function to reload environment variables and logging configuration
-reload_env_and_logging()
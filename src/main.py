@@ -1,34 +1,60 @@
+import time
+_process_started = time.perf_counter()  # Taken before any other import so the startup report includes imports
+
+import atexit
 import logging
+import argparse
 from flask import Flask
 from flask_apscheduler import APScheduler
-import os
 from pathlib import Path
 import sys
-from dotenv import load_dotenv
 
 # Add the project root to the system path for module resolution
 project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
 
-# Load environment variables from .env file
-load_dotenv(dotenv_path=project_root / '.env')
-
 # Import custom modules
-from happy_birthday import HappyBirthday
-from db_functions import DBConnection, create_database
+from config import get_config
+from db_functions import create_database
 from logging_config import setup_logging
-from healthcheck import healthcheck  
-from public_holiday import PublicHoliday 
+from healthcheck import healthcheck
+from metrics_endpoint import metrics_endpoint
+from metrics import track_job
+from job_profiling import profile_job
+from profiling_endpoint import profiling_endpoint
 from import_data import PeopleForceDataImporter
+from services import get_services
+from leader_lease import leader_only
+from circuit_breaker import Deadline
+from startup_timing import StartupTimer, print_import_profile
 
-# Setup logging configuration
-setup_logging()
 logger = logging.getLogger(__name__)
 
-logger.info("Starting Flask application setup")
+startup_timer = StartupTimer(_process_started)
+startup_timer.mark("imports")
+
+_first_request_logged = False
+
+def log_time_to_first_request(response):
+    # Time from process start to the first response, reported once
+    global _first_request_logged
+    if not _first_request_logged:
+        _first_request_logged = True
+        logger.info(f"First request served {time.perf_counter() - _process_started:.3f}s after process start")
+    return response
+
+# Application factory; WSGI servers get an app without the admin endpoints, which belong to the scheduler process
+def create_app(admin=True):
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(healthcheck)
+    flask_app.register_blueprint(metrics_endpoint)
+    if admin:
+        flask_app.register_blueprint(profiling_endpoint)
+    flask_app.after_request(log_time_to_first_request)
+    return flask_app
 
 # Initialize Flask application
-app = Flask(__name__)
+app = create_app()
 
 # Initialize and start the APScheduler
 scheduler = APScheduler()
@@ -39,11 +65,9 @@ def initialize_scheduler():
         scheduler.start()
         logger.debug("Scheduler initialized and started")
 
-# Initialize database connection
-db_connection = DBConnection()
-
 # Function to ensure database and tables are created
 def ensure_database_setup():
+    db_connection = get_services().db_connection
     if not db_connection.check_database():
         logger.info("Database not found or not accessible. Creating database and importing data.")
         create_database()
@@ -58,87 +82,139 @@ def ensure_database_setup():
                 create_database()
                 PeopleForceDataImporter().update_data_from_api()
                 break
+        else:
+            # Schema creation is idempotent and brings new tables, columns and indexes to existing databases
+            create_database()
 
 # Function to schedule daily data update
 def schedule_daily_data_update():
+    config = get_config()
     if not scheduler.get_job('daily_data_update'):
         scheduler.add_job(
-            func=PeopleForceDataImporter().update_data_from_api,
+            func=leader_only(get_services().leader_lease, 'daily_data_update', daily_data_update),
             trigger='cron',
-            hour=get_schedule_time("DAILY_UPDATE_HOUR", 6),  # Get the hour from environment variables
-            minute=get_schedule_time("DAILY_UPDATE_MINUTE", 0),  # Get the minute from environment variables
+            hour=log_schedule_time("DAILY_UPDATE_HOUR", config.daily_update_hour),
+            minute=log_schedule_time("DAILY_UPDATE_MINUTE", config.daily_update_minute),
             timezone='UTC',
             id='daily_data_update'
         )
         logger.info("Daily data update job scheduled")
 
-# Get webhook URL from environment variables
-webhook_url = os.getenv("WEBHOOK_URL")
-
-# Get notify_if_none parameter from environment variables
-notify_if_none = os.getenv("NOTIFY_IF_NONE", "false").lower() == "true"  # Convert to boolean
-
-# Initialize birthday and public holiday handlers
-birthday_celebrator = HappyBirthday(db_connection, webhook_url)
-public_holiday = PublicHoliday(db_connection, webhook_url)
+# Function to run the daily import followed by message pregeneration
+def daily_data_update():
+    with track_job('daily_data_update'), profile_job('daily_data_update'):
+        PeopleForceDataImporter().update_data_from_api()
+        try:
+            get_services().message_pregenerator.pregenerate()
+        except Exception as e:
+            logger.error(f"Error pregenerating messages: {e}", exc_info=True)
 
-# Function to schedule birthday wishes
-def schedule_birthday_wishes():
+# Function to schedule birthday wishes; with local delivery it runs per timezone group for the group's local date
+def schedule_birthday_wishes(date=None, zone_group=None):
     logger.info("Scheduling birthday wishes")
     try:
-        birthday_celebrator.send_birthday_wishes(notify_if_none=notify_if_none)  # Pass the notify_if_none parameter
+        config = get_config()
+        notify_if_none = config.notify_if_none
+        with track_job('birthday_wish_job'), profile_job('birthday_wish_job'):
+            deadline = Deadline(config.birthday_deadline_seconds) if config.birthday_deadline_seconds else None
+            get_services().birthday_celebrator.send_birthday_wishes(date, notify_if_none=notify_if_none,  # Pass the notify_if_none parameter
+                                                                    zone_group=zone_group, deadline=deadline)
     except Exception as e:
         logger.error(f"Error scheduling birthday wishes: {e}", exc_info=True)
 
 # Function to schedule public holiday messages
-def schedule_public_holidays():
+def schedule_public_holidays(date=None, zone_group=None):
     logger.info("Scheduling public holiday messages")
     try:
-        public_holiday.generate_and_send_holiday_message()
+        config = get_config()
+        with track_job('public_holiday_message_job'), profile_job('public_holiday_message_job'):
+            deadline = Deadline(config.holiday_deadline_seconds) if config.holiday_deadline_seconds else None
+            get_services().public_holiday.generate_and_send_holiday_message(date, zone_group, deadline)
     except Exception as e:
         logger.error(f"Error scheduling public holiday messages: {e}", exc_info=True)
 
-# Function to get scheduling times from environment variables
-def get_schedule_time(env_var, default):
-    value = int(os.getenv(env_var, default))
+# Function to log the configured scheduling times
+def log_schedule_time(env_var, value):
     logger.info(f"{env_var} is set to {value}")
     return value
 
 def schedule_jobs():
+    config = get_config()
+    # Jobs with a local send time run from one ticking job, once per timezone group
+    local_delivery = get_services().local_delivery
+    if config.birthday_local_time:
+        local_delivery.add_job('birthday_wish_job', config.birthday_local_time, schedule_birthday_wishes)
+    if config.holiday_local_time:
+        local_delivery.add_job('public_holiday_message_job', config.holiday_local_time, schedule_public_holidays)
+    if local_delivery.jobs and not scheduler.get_job('local_delivery_tick'):
+        scheduler.add_job(
+            func=leader_only(get_services().leader_lease, 'local_delivery_tick', local_delivery.tick),
+            trigger='cron',
+            second=0,
+            timezone='UTC',
+            id='local_delivery_tick'
+        )
+        logger.info("Local delivery job scheduled")
+
     # Schedule the birthday wishes job
-    if not scheduler.get_job('birthday_wish_job'):
+    if not config.birthday_local_time and not scheduler.get_job('birthday_wish_job'):
         scheduler.add_job(
-            func=schedule_birthday_wishes, 
-            trigger='cron', 
-            hour=get_schedule_time("BIRTHDAY_HOUR", 7), 
-            minute=get_schedule_time("BIRTHDAY_MINUTE", 0), 
+            func=leader_only(get_services().leader_lease, 'birthday_wish_job', schedule_birthday_wishes),
+            trigger='cron',
+            hour=log_schedule_time("BIRTHDAY_HOUR", config.birthday_hour),
+            minute=log_schedule_time("BIRTHDAY_MINUTE", config.birthday_minute),
             timezone='UTC',
             id='birthday_wish_job'
         )
         logger.info("Birthday wishes job scheduled")
 
     # Schedule the public holiday messages job
-    if not scheduler.get_job('public_holiday_message_job'):
+    if not config.holiday_local_time and not scheduler.get_job('public_holiday_message_job'):
         scheduler.add_job(
-            func=schedule_public_holidays, 
-            trigger='cron', 
-            hour=get_schedule_time("HOLIDAY_HOUR", 7), 
-            minute=get_schedule_time("HOLIDAY_MINUTE", 1), 
+            func=leader_only(get_services().leader_lease, 'public_holiday_message_job', schedule_public_holidays),
+            trigger='cron',
+            hour=log_schedule_time("HOLIDAY_HOUR", config.holiday_hour),
+            minute=log_schedule_time("HOLIDAY_MINUTE", config.holiday_minute),
             timezone='UTC',
-            id='public_holiday_message_job'  
+            id='public_holiday_message_job'
         )
         logger.info("Public holiday messages job scheduled")
 
-# Register healthcheck blueprint
-app.register_blueprint(healthcheck)
+# Database setup, leader election, scheduled jobs and the outbox worker; everything but serving HTTP
+def start_background_work():
+    ensure_database_setup()
+    startup_timer.mark("database_setup")
+    # Every replica schedules the jobs, only the one holding the leader lease runs them
+    leader_lease = get_services().leader_lease
+    if leader_lease is not None:
+        leader_lease.start()
+        atexit.register(leader_lease.stop)  # Hand over right away on a clean shutdown
+    initialize_scheduler()
+    schedule_daily_data_update()
+    schedule_jobs()
+    outbox_worker = get_services().outbox_worker
+    if outbox_worker is not None:
+        outbox_worker.start()  # Also picks up entries left undelivered before a restart
+    startup_timer.mark("scheduler")
+
+# Development server with the scheduler in the same process; serve.py runs them apart for production
+def main():
+    setup_logging()
+    logger.info("Starting Flask application setup")
+    start_background_work()
+    startup_timer.log_report()
+    logger.info("Running the Flask application")
+    app.run(host='0.0.0.0', port=8080, debug=False)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the birthday and public holiday notifier.')
+    parser.add_argument('--import-profile', action='store_true',
+                        help='Print how long importing the application takes, per module, and exit')
+    args = parser.parse_args()
+    if args.import_profile:
+        print_import_profile("main")
+        sys.exit(0)
     try:
-        ensure_database_setup()
-        initialize_scheduler()
-        schedule_daily_data_update()
-        schedule_jobs()
-        logger.info("Running the Flask application")
-        app.run(host='0.0.0.0', port=8080, debug=False)
+        main()
     except Exception as e:
         logger.error(f"Failed to start the Flask application: {e}", exc_info=True)
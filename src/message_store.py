@@ -0,0 +1,51 @@
+import sys
+import json
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+logger = logging.getLogger(__name__)
+
+STORED_MESSAGE_SELECT = '''
+    SELECT message, fingerprint FROM PregeneratedMessages
+    WHERE job = ? AND date = ? AND item_key = ?
+'''
+STORED_MESSAGE_INSERT = '''
+    INSERT OR REPLACE INTO PregeneratedMessages (job, date, item_key, fingerprint, message, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+PURGE_MESSAGES_DELETE = "DELETE FROM PregeneratedMessages WHERE date < ?"
+
+
+def fingerprint(*parts):
+    # Hash of everything a generated message depends on; a different hash means the message is stale
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MessageStore:
+    # Generated messages keyed by (job, date, item), reused while their input fingerprint matches
+    def __init__(self, db_connection):
+        self.db = db_connection
+
+    def get(self, job, date, item_key, expected_fingerprint):
+        rows = self.db.execute(STORED_MESSAGE_SELECT, (job, date, item_key))
+        if not rows:
+            return None
+        if rows[0]['fingerprint'] != expected_fingerprint:
+            logger.info(f"Stored {job} message for {date}/{item_key} is stale, inputs changed")
+            return None
+        return json.loads(rows[0]['message'])
+
+    def put(self, job, date, item_key, message_fingerprint, message):
+        self.db.execute(STORED_MESSAGE_INSERT, (job, date, item_key, message_fingerprint, json.dumps(message, ensure_ascii=False),
+              datetime.utcnow().isoformat()))
+
+    def purge(self, before_date):
+        # Remove messages for days that have already passed
+        self.db.execute(PURGE_MESSAGES_DELETE, (before_date,))
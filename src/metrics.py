@@ -0,0 +1,216 @@
+import time
+import logging
+import threading
+import functools
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    # A metric family; each distinct set of label values gets its own child
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in sorted(children):
+            for suffix, extra, value in child.samples():
+                lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [("", None, self.value)]
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            samples.append(("_bucket", [("le", _format_value(float(bound)))], cumulative))
+        samples.append(("_sum", None, total))
+        samples.append(("_count", None, cumulative))
+        return samples
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(f"{name}_total", documentation, labelnames)
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+UPSTREAM_LATENCY = REGISTRY.register(Histogram(
+    "upstream_request_duration_seconds", "Latency of upstream client calls.", ("client", "method")))
+UPSTREAM_ERRORS = REGISTRY.register(Counter(
+    "upstream_request_errors", "Upstream client calls that raised or returned an error.", ("client", "method")))
+JOB_DURATION = REGISTRY.register(Histogram(
+    "job_duration_seconds", "Duration of scheduled job runs.", ("job",), buckets=JOB_BUCKETS))
+JOB_FAILURES = REGISTRY.register(Counter(
+    "job_failures", "Scheduled job runs that failed.", ("job",)))
+JOB_LAST_SUCCESS = REGISTRY.register(Gauge(
+    "job_last_success_timestamp_seconds", "Unix time of the last successful run of each scheduled job.", ("job",)))
+IMPORT_ROWS = REGISTRY.register(Counter(
+    "import_rows", "Rows written by the PeopleForce import, per table.", ("table",)))
+DB_QUERY_LATENCY = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Duration of DBConnection.execute calls.", ("mode",)))
+DB_QUERY_ERRORS = REGISTRY.register(Counter(
+    "db_query_errors", "DBConnection.execute calls that raised.", ("mode",)))
+LEADER_STATUS = REGISTRY.register(Gauge(
+    "leader", "1 while this replica holds the leader lease and runs the scheduled jobs.", ("lease",)))
+LEADER_TOKEN = REGISTRY.register(Gauge(
+    "leader_fencing_token", "Fencing token of the lease term this replica holds.", ("lease",)))
+BREAKER_STATE = REGISTRY.register(Gauge(
+    "circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open.", ("breaker",)))
+BREAKER_REJECTED = REGISTRY.register(Counter(
+    "circuit_breaker_rejected_calls", "Calls rejected without reaching the upstream.", ("breaker",)))
+HOLIDAY_GROUPS = REGISTRY.register(Counter(
+    "holiday_groups", "Holiday groups formed for announcements, by who decided the grouping.", ("method",)))
+TEMPLATE_FALLBACKS = REGISTRY.register(Counter(
+    "template_fallback_messages", "Messages rendered from a template because generation failed.", ("job",)))
+
+
+def track_upstream(client, is_error=None):
+    # Decorator recording latency and errors of an upstream client method; is_error inspects the return value
+    def decorator(func):
+        latency = UPSTREAM_LATENCY.labels(client=client, method=func.__name__)
+        errors = UPSTREAM_ERRORS.labels(client=client, method=func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+            if is_error is not None and is_error(result):
+                errors.inc()
+            return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def track_job(job_id):
+    # Record the duration of a scheduled job run and whether it succeeded
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        JOB_FAILURES.labels(job=job_id).inc()
+        raise
+    finally:
+        JOB_DURATION.labels(job=job_id).observe(time.perf_counter() - started)
+    JOB_LAST_SUCCESS.labels(job=job_id).set(time.time())
@@ -0,0 +1,18 @@
+from flask import Blueprint, Response
+from pathlib import Path
+import sys
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from metrics import REGISTRY
+
+# Create a Flask Blueprint for the Prometheus scrape endpoint
+metrics_endpoint = Blueprint('metrics', __name__)
+
+@metrics_endpoint.route('/metrics')
+def metrics():
+    """Endpoint exposing application metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,4 @@
 import os
-from dotenv import load_dotenv
 import logging
 import sys
 from pathlib import Path
@@ -9,48 +8,90 @@ project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
 
 # Import custom modules
-from logging_config import setup_logging
+from config import get_config
+from http_transport import get_transport
+from llm_cache import get_llm_cache, cache_key
+from circuit_breaker import get_circuit_breaker
+from metrics import track_upstream
 
-# Setup logging configuration
-setup_logging()
 logger = logging.getLogger(__name__)
 
 class OpenAI_API:
     def __init__(self):
-        load_dotenv()  # Load environment variables from .env file
-        self.api_key = os.getenv('OPENAI_API_KEY')  # Get API key from environment variables
+        config = get_config()
+        self.api_key = config.openai_api_key  # Get API key from the configuration
+        self.api_base = config.openai_api_base  # OpenAI-compatible endpoint, e.g. a local stand-in for benchmarks
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',  # Set authorization header
             'Content-Type': 'application/json'  # Set content type to JSON
         }
+        self.transport = get_transport()  # Shared pooled HTTP transport
+        self.breaker = get_circuit_breaker("openai")  # Shared by every client, so one outage opens it for all
+        self.cache_enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
         logger.info("OpenAI_API initialized successfully.")
 
-    def make_request(self, endpoint, data, method='POST'):
-        import requests
-        url = f'https://api.openai.com/v1/{endpoint}'  # Construct the full URL
+    @track_upstream("openai", is_error=lambda response: 'error' in response)
+    def make_request(self, endpoint, data, method='POST', timeout=None, retries=None):
+        url = f'{self.api_base}/{endpoint}'  # Construct the full URL
         logger.info(f"Making {method} request to {url}")
         logger.debug(f"Making {method} request to {url} with data: {data}")
         if method == 'POST':
-            response = requests.post(url, headers=self.headers, json=data)  # Make a POST request
+            response = self.transport.post(url, headers=self.headers, json=data, timeout=timeout,
+                                           retries=retries)  # Make a POST request
         elif method == 'GET':
-            response = requests.get(url, headers=self.headers, params=data)  # Make a GET request
+            response = self.transport.get(url, headers=self.headers, params=data, timeout=timeout,
+                                          retries=retries)  # Make a GET request
         logger.info(f"Received response: {response.status_code}")
         logger.debug(f"Received response: {response.status_code} - {response.text}")
         return response.json()  # Return the response as JSON
 
-    def chat_completion(self, messages, model="gpt-4o-mini", temperature=0.7):
-        # Generate text completion using OpenAI's GPT model
+    def chat_completion(self, messages, model="gpt-4o-mini", temperature=0.7, use_case=None, response_format=None,
+                        deadline=None):
+        # Generate text completion using OpenAI's GPT model.
+        # Responses for a named use case are cached unless that use case opted out (LLM_CACHE_OPT_OUT).
+        # Raises CircuitOpen while OpenAI keeps failing and DeadlineExceeded once the job's deadline has passed;
+        # with a deadline the request is also cut short when it runs out.
+        cache = get_llm_cache() if self.cache_enabled and use_case else None
+        if cache is not None and not cache.enabled_for(use_case):
+            cache = None
+        if cache is not None:
+            key = cache_key(model, temperature, messages, response_format)
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for use case '{use_case}'")
+                return cached
+
         data = {
             'model': model,
             'messages': messages,
             'temperature': temperature
         }
-        return self.make_request('chat/completions', data)  # Make a request to the chat completions endpoint
+        if response_format is not None:
+            data['response_format'] = response_format  # Structured (JSON schema) output
+        timeout = None
+        if deadline is not None:
+            deadline.check("calling OpenAI")
+            timeout = deadline.timeout(self.transport.connect_timeout, self.transport.read_timeout)
+        self.breaker.check()
+        try:
+            response = self.make_request('chat/completions', data, timeout=timeout)  # Make a request to the chat completions endpoint
+        except Exception:
+            if deadline is not None and deadline.expired():
+                # Cut short by the job's own deadline, which says nothing about OpenAI's health
+                self.breaker.release()
+            else:
+                self.breaker.record(False)
+            raise
+        self.breaker.record(bool(response.get('choices')))
+        if cache is not None and response.get('choices'):
+            cache.set(key, use_case, response)  # Only successful completions are cached
+        return response
 
-    def check_api_status(self):
-        # Check the availability of the OpenAI API
+    def check_api_status(self, timeout=None):
+        # Check the availability of the OpenAI API; with a timeout the check is a single attempt bounded by it
         try:
-            response = self.make_request('models', {}, 'GET')  # Make a GET request to the models endpoint
+            response = self.make_request('models', {}, 'GET', timeout=timeout,
+                                         retries=0 if timeout else None)  # Make a GET request to the models endpoint
             if response.get('error'):
                 logger.error(f"OpenAI API check failed: {response['error']}")  # Log an error if the API check fails
                 return False
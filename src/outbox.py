@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from google_space_webhook import GoogleChatWebhook, DELIVERY_CARD, DELIVERY_THREAD
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_INSERT = '''
+    INSERT OR IGNORE INTO Outbox (idempotency_key, job, date, item_key, webhook_url, payload, status, attempts,
+                                  next_attempt_at, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?)
+'''
+DUE_ENTRIES_SELECT = '''
+    SELECT id, idempotency_key, webhook_url, payload, attempts FROM Outbox
+    WHERE status = 'pending' AND next_attempt_at <= ?
+    ORDER BY next_attempt_at
+    LIMIT ?
+'''
+CLAIM_ENTRY_UPDATE = "UPDATE Outbox SET status = 'sending', claimed_at = ? WHERE id = ? AND status = 'pending'"
+RELEASE_STALE_UPDATE = "UPDATE Outbox SET status = 'pending' WHERE status = 'sending' AND claimed_at < ?"
+PURGE_SENT_DELETE = "DELETE FROM Outbox WHERE status = 'sent' AND sent_at < ?"
+STATUS_COUNTS_SELECT = "SELECT status, COUNT(*) AS count FROM Outbox GROUP BY status"
+MARK_SENT_UPDATE = "UPDATE Outbox SET status = 'sent', attempts = ?, sent_at = ?, last_error = NULL WHERE id = ?"
+MARK_DEAD_UPDATE = "UPDATE Outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?"
+SCHEDULE_RETRY_UPDATE = "UPDATE Outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?"
+
+# 4xx responses other than these will fail the same way on every retry
+RETRYABLE_CLIENT_ERRORS = {408, 429}
+
+
+def idempotency_key(job, date, item_key, route=None):
+    # The same item sent to two routed spaces is two deliveries
+    if route:
+        return f"{job}:{date}:{route}:{item_key}"
+    return f"{job}:{date}:{item_key}"
+
+
+class Outbox:
+    # Durable queue of generated messages; delivery is retried until it succeeds or the entry is dead-lettered
+    def __init__(self, db_connection, fence=None):
+        self.db = db_connection
+        self.fence = fence  # Checked inside the enqueue transaction, e.g. that we still hold the leader lease
+        self.max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+        self.backoff_base = float(os.getenv("OUTBOX_BACKOFF_BASE", 30))
+        self.backoff_max = float(os.getenv("OUTBOX_BACKOFF_MAX", 3600))
+        self.batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", 50))
+        # A 'sending' entry older than this belongs to a process that died mid-delivery
+        self.claim_timeout = float(os.getenv("OUTBOX_CLAIM_TIMEOUT", 300))
+        self.retention_days = int(os.getenv("OUTBOX_RETENTION_DAYS", 30))
+        # Spaces delivered to in parallel; entries for one space always go out in order
+        self.concurrency = max(1, int(os.getenv("OUTBOX_CONCURRENCY", 4)))
+        self._webhooks = {}
+        self._lock = threading.Lock()
+        self.counters = {"enqueued": 0, "duplicates": 0, "sent": 0, "retried": 0, "dead": 0}
+        self.started = time.monotonic()
+        self.notify = None  # Set by OutboxWorker so new entries are delivered without waiting for the next poll
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _webhook(self, url):
+        with self._lock:
+            if url not in self._webhooks:
+                self._webhooks[url] = GoogleChatWebhook(url)
+            return self._webhooks[url]
+
+    def enqueue(self, job, date, item_key, messages, webhook_url, mode=None, thread_key=None, title=None,
+                route=None):
+        # Add one delivery; an entry with the same (job, date, route, item) key is never added twice
+        key = idempotency_key(job, date, item_key, route)
+        payload = json.dumps({"messages": messages, "mode": mode, "thread_key": thread_key, "title": title},
+                             ensure_ascii=False)
+        now = datetime.utcnow().isoformat()
+        with self.db.connection() as conn:
+            inserted = conn.execute(OUTBOX_INSERT, (key, job, date, str(item_key), webhook_url, payload, now,
+                                                    now)).rowcount
+            if self.fence is not None:
+                self.fence(conn)
+        if inserted:
+            self._count("enqueued")
+            logger.info(f"Queued outbox entry {key}")
+        else:
+            self._count("duplicates")
+            logger.info(f"Outbox entry {key} already exists, not queued again")
+        return bool(inserted)
+
+    def enqueue_messages(self, job, date, items, webhook_url, thread_key=None, title=None, route=None):
+        # Queue a day's (item_key, message) pairs using the webhook's delivery mode
+        if not items:
+            return 0
+        mode = self._webhook(webhook_url).delivery_mode
+        if mode == DELIVERY_CARD and len(items) > 1:
+            # The whole day goes out as one card, so it is one entry
+            queued = int(self.enqueue(job, date, "digest", [message for _, message in items], webhook_url,
+                                      mode=DELIVERY_CARD, title=title, route=route))
+        else:
+            key = thread_key if mode == DELIVERY_THREAD else None
+            queued = sum(self.enqueue(job, date, item_key, [message], webhook_url, mode=mode, thread_key=key,
+                                      route=route)
+                         for item_key, message in items)
+        if queued and self.notify is not None:
+            self.notify()
+        return queued
+
+    def _backoff(self, attempts):
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1))))
+
+    def _deliver(self, entry):
+        payload = json.loads(entry['payload'])
+        results = self._webhook(entry['webhook_url']).send_messages(
+            payload['messages'], mode=payload['mode'], thread_key=payload['thread_key'], title=payload['title'])
+        failed = [result for result in results if not result.ok]
+        if not failed:
+            return None, False
+        status_code = failed[0].status_code
+        permanent = status_code is not None and 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+        return f"HTTP {status_code}" if status_code is not None else failed[0].error, permanent
+
+    def drain(self, limit=None):
+        # Deliver due entries once; returns the number delivered
+        now = datetime.utcnow()
+        stale_before = (now - timedelta(seconds=self.claim_timeout)).isoformat()
+        self.db.execute(RELEASE_STALE_UPDATE, (stale_before,))
+        entries = self.db.execute(DUE_ENTRIES_SELECT, (now.isoformat(), limit or self.batch_size))
+
+        # One sequential lane per space, lanes run in parallel
+        lanes = {}
+        for entry in entries:
+            lanes.setdefault(entry['webhook_url'], []).append(entry)
+        if len(lanes) <= 1 or self.concurrency == 1:
+            return sum(self._drain_lane(lane) for lane in lanes.values())
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(lanes)), thread_name_prefix="outbox") as pool:
+            return sum(pool.map(self._drain_lane, lanes.values()))
+
+    def _drain_lane(self, entries):
+        return sum(self._process(entry) for entry in entries)
+
+    def _process(self, entry):
+        # Claim, deliver and record the outcome of one entry; True when it was delivered
+        with self.db.connection() as conn:
+            # Another worker may have claimed the entry since it was selected
+            if not conn.execute(CLAIM_ENTRY_UPDATE, (datetime.utcnow().isoformat(), entry['id'])).rowcount:
+                return False
+        try:
+            error, permanent = self._deliver(entry)
+        except Exception as e:
+            error, permanent = str(e), False
+        attempts = entry['attempts'] + 1
+        finished = datetime.utcnow()
+        if error is None:
+            self.db.execute(MARK_SENT_UPDATE, (attempts, finished.isoformat(), entry['id']))
+            self._count("sent")
+            return True
+        if permanent or attempts >= self.max_attempts:
+            self.db.execute(MARK_DEAD_UPDATE, (attempts, error, entry['id']))
+            self._count("dead")
+            logger.error(f"Outbox entry {entry['idempotency_key']} moved to dead letter after {attempts} "
+                         f"attempt(s): {error}")
+        else:
+            next_attempt = finished + timedelta(seconds=self._backoff(attempts))
+            self.db.execute(SCHEDULE_RETRY_UPDATE, (attempts, error, next_attempt.isoformat(), entry['id']))
+            self._count("retried")
+            logger.warning(f"Outbox entry {entry['idempotency_key']} failed ({error}), "
+                           f"retrying at {next_attempt.isoformat()}")
+        return False
+
+    def purge(self):
+        # Forget delivered entries past the retention period
+        before = (datetime.utcnow() - timedelta(days=self.retention_days)).isoformat()
+        self.db.execute(PURGE_SENT_DELETE, (before,))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        counters["by_status"] = {row['status']: row['count'] for row in self.db.execute(STATUS_COUNTS_SELECT)}
+        uptime = time.monotonic() - self.started
+        counters["sent_per_minute"] = round(counters["sent"] / uptime * 60, 2) if uptime > 0 else 0.0
+        return counters
+
+
+class OutboxWorker:
+    # Background thread draining the outbox, woken early whenever something is queued
+    def __init__(self, outbox, poll_interval=None):
+        self.outbox = outbox
+        self.poll_interval = float(poll_interval or os.getenv("OUTBOX_POLL_INTERVAL", 5))
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_purge = 0.0
+        outbox.notify = self.wake
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+            self._thread.start()
+            logger.info(f"Outbox worker started, polling every {self.poll_interval}s")
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # Keep going while full batches are being delivered
+                while not self._stop.is_set() and self.outbox.drain() >= self.outbox.batch_size:
+                    pass
+                if time.monotonic() - self._last_purge > 3600:
+                    self.outbox.purge()
+                    self._last_purge = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error draining outbox: {e}", exc_info=True)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
@@ -1,8 +1,7 @@
-import os
 import sys
-import requests
 import logging
-from dotenv import load_dotenv
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
 # Add the project root directory to the sys.path
@@ -11,19 +10,115 @@ sys.path.append(str(project_root))
 
 # Import custom logging configuration
 from logging_config import setup_logging
+from config import get_config
+from http_transport import get_transport
+from metrics import track_upstream
+from json_stream import StreamedDocument
 
-# Setup logging configuration
-setup_logging()
 logger = logging.getLogger(__name__)
 
-# Load environment variables from a .env file
-load_dotenv()
+# Bytes read from the connection at a time while a page is decoded
+STREAM_CHUNK_SIZE = 64 * 1024
+# Streamed records are handed to list-based writers in batches of this size
+RECORD_BATCH_SIZE = 100
+
+
+def _last_page(fields):
+    # PeopleForce reports the page count in metadata.pagination when available
+    try:
+        return int(fields["metadata"]["pagination"]["pages"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RecordStream:
+    # Records of a paginated endpoint, one at a time across pages. Each page is decoded while it is read
+    # from the connection, so memory does not grow with the page size or the number of pages;
+    # up to read_ahead further pages are requested while the current one is consumed.
+    def __init__(self, api, path, params=None, read_ahead=0, executor=None):
+        self.api = api
+        self.path = path
+        self.params = dict(params or {})
+        self.read_ahead = max(0, int(read_ahead))
+        self.executor = executor
+        self.pages = 0
+        self.records = 0
+
+    def _request(self, pool, page):
+        if pool is not None:
+            return pool.submit(self.api.open_page, self.path, self.params, page)
+        future = Future()
+        try:
+            future.set_result(self.api.open_page(self.path, self.params, page))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    @staticmethod
+    def _discard(future):
+        # Close a page that was requested ahead but is not needed anymore
+        if not future.cancel():
+            future.add_done_callback(lambda done: done.exception() is None and done.result().close())
+
+    def __iter__(self):
+        own_pool = None
+        pool = self.executor
+        if pool is None and self.read_ahead:
+            pool = own_pool = ThreadPoolExecutor(max_workers=self.read_ahead,
+                                                 thread_name_prefix=f"peopleforce-{self.path}")
+        in_flight = deque()
+        next_page = 1
+        last_page = None
+        try:
+            while True:
+                while len(in_flight) <= self.read_ahead and (last_page is None or next_page <= last_page):
+                    in_flight.append((next_page, self._request(pool, next_page)))
+                    next_page += 1
+                if not in_flight:
+                    return
+
+                page, future = in_flight.popleft()
+                response = future.result()
+                document = StreamedDocument(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+                count = 0
+                try:
+                    for record in document:
+                        count += 1
+                        self.records += 1
+                        yield record
+                finally:
+                    response.close()
+                if not count:
+                    return  # Empty page means we are past the last page
+                self.pages += 1
+
+                reported = _last_page(document.fields)
+                if reported is not None:
+                    last_page = reported
+                    if page >= last_page:
+                        return
+        finally:
+            for _, future in in_flight:
+                self._discard(future)
+            if own_pool is not None:
+                own_pool.shutdown(wait=False)
+
+    def batches(self, size=RECORD_BATCH_SIZE):
+        # Group the records into lists of up to `size`, for writers that work on lists
+        batch = []
+        for record in self:
+            batch.append(record)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
 class PeopleForceAPI:
-    BASE_URL = os.getenv("PEOPLEFORCE_API_URL")  # Base URL for the PeopleForce API
-    
     def __init__(self):
-        api_key = os.getenv("PEOPLEFORCE_API_KEY")  # API key for authentication
+        config = get_config()
+        self.BASE_URL = config.peopleforce_api_url  # Base URL for the PeopleForce API
+        api_key = config.peopleforce_api_key  # API key for authentication
         
         # Debugging environment variables
         logger.debug(f"PEOPLEFORCE_API_URL: {self.BASE_URL}")
@@ -45,82 +140,109 @@ class PeopleForceAPI:
             "accept": "application/json",
             "Content-Type": "application/json"
         }
+        self.transport = get_transport()  # Shared pooled HTTP transport
         logger.info("PeopleForceAPI initialized successfully.")
 
     # List all employees
+    @track_upstream("peopleforce")
     def list_all_employees(self, params=None):
         url = f"{self.BASE_URL}/employees"
         logger.info(f"Requesting all employees from {url} with params: {params}")
-        response = requests.get(url, headers=self.headers, params=params)
-        logger.debug(f"Response status code: {response.status_code}")
-        logger.debug(f"Response content: {response.content}")
+        response = self.transport.get(url, headers=self.headers, params=params)
+        logger.debug(f"Response status code: {response.status_code}, {len(response.content)} bytes")
         response.raise_for_status()  # Raise an error for bad status codes
         return response.json()
 
+    # Request one page of a paginated endpoint; the body stays on the connection until it is streamed
+    @track_upstream("peopleforce")
+    def open_page(self, path, params, page):
+        url = f"{self.BASE_URL}/{path}"
+        logger.debug(f"Requesting page {page} of {url} with params: {params}")
+        response = self.transport.get(url, headers=self.headers, params=dict(params, page=page), stream=True)
+        if response.status_code >= 400:
+            response.close()
+            response.raise_for_status()  # Raise an error for bad status codes
+        return response
+
+    # Iterate over every record of a paginated endpoint, e.g. iter_records("employees", {"status": "active"})
+    def iter_records(self, path, params=None, read_ahead=0, executor=None):
+        return RecordStream(self, path, params, read_ahead, executor)
+
     # Get an employee
+    @track_upstream("peopleforce")
     def get_employee(self, employee_id):
         url = f"{self.BASE_URL}/employees/{employee_id}"
         logger.info(f"Requesting employee {employee_id} from {url}")
-        response = requests.get(url, headers=self.headers)
+        response = self.transport.get(url, headers=self.headers)
         response.raise_for_status()  # Raise an error for bad status codes
         return response.json()
 
     # List of employee holidays
+    @track_upstream("peopleforce")
     def list_employee_holidays(self, employee_id):
         url = f"{self.BASE_URL}/employees/{employee_id}/holidays"
         logger.info(f"Requesting holidays for employee {employee_id} from {url}")
-        response = requests.get(url, headers=self.headers)
+        response = self.transport.get(url, headers=self.headers)
         response.raise_for_status()  # Raise an error for bad status codes
         return response.json()
 
     # List all locations
+    @track_upstream("peopleforce")
     def list_all_locations(self):
         url = f"{self.BASE_URL}/locations"
         logger.info(f"Requesting all locations from {url}")
-        response = requests.get(url, headers=self.headers)
+        response = self.transport.get(url, headers=self.headers)
         response.raise_for_status()  # Raise an error for bad status codes
         return response.json()
 
     # List all holidays
+    @track_upstream("peopleforce")
     def list_all_holidays(self, page=1):
         url = f"{self.BASE_URL}/holidays?page={page}"
         logger.info(f"Requesting all holidays from {url}")
-        response = requests.get(url, headers=self.headers)
+        response = self.transport.get(url, headers=self.headers)
         response.raise_for_status()  # Raise an error for bad status codes
         return response.json()
 
     # List company calendar events
+    @track_upstream("peopleforce")
     def list_company_calendar_events(self):
         url = f"{self.BASE_URL}/calendars"
         logger.info(f"Requesting company calendar events from {url}")
-        response = requests.get(url, headers=self.headers)
-        logger.debug(f"Response status code: {response.status_code}")
-        logger.debug(f"Response content: {response.content}")
+        response = self.transport.get(url, headers=self.headers)
+        logger.debug(f"Response status code: {response.status_code}, {len(response.content)} bytes")
         response.raise_for_status()  # Raise an error for bad status codes
         return response.json()
 
     # List all holiday policies
+    @track_upstream("peopleforce")
     def list_all_holiday_policies(self):
         url = f"{self.BASE_URL}/holiday_policies"
         logger.info(f"Requesting all holiday policies from {url}")
-        response = requests.get(url, headers=self.headers)
-        logger.debug(f"Response status code: {response.status_code}")
-        logger.debug(f"Response content: {response.content}")
+        response = self.transport.get(url, headers=self.headers)
+        logger.debug(f"Response status code: {response.status_code}, {len(response.content)} bytes")
         response.raise_for_status()  # Raise an error for bad status codes
         return response.json()
 
     # List all teams
+    @track_upstream("peopleforce")
     def list_all_teams(self):
         url = f"{self.BASE_URL}/teams"
         logger.info(f"Requesting all teams from {url}")
-        response = requests.get(url, headers=self.headers)
+        response = self.transport.get(url, headers=self.headers)
         response.raise_for_status()  # Raise an error for bad status codes
         return response.json()
 
-    def check_api_status(self):
-        # Check the availability of the PeopleForce API
+    def check_api_status(self, timeout=None):
+        # Check the availability of the PeopleForce API; with a timeout the check is a single attempt bounded by it
         try:
-            response = self.list_all_locations()  # Use an existing method to check availability
+            if timeout:
+                response = self.transport.get(f"{self.BASE_URL}/locations", headers=self.headers, timeout=timeout,
+                                              retries=0)
+                response.raise_for_status()
+                response = response.json()
+            else:
+                response = self.list_all_locations()  # Use an existing method to check availability
             if response.get('error'):
                 logger.error(f"PeopleForce API check failed: {response['error']}")
                 return False
@@ -130,6 +252,7 @@ class PeopleForceAPI:
             return False
 
 if __name__ == "__main__":
+    setup_logging()
     # Initialize the API
     api = PeopleForceAPI()
     print("\nListing all locations:")
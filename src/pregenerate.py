@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from logging_config import setup_logging
+from db_functions import DBConnection
+
+logger = logging.getLogger(__name__)
+
+
+class MessagePregenerator:
+    def __init__(self, birthday_celebrator, public_holiday, days=None, zone_groups=None):
+        self.birthday_celebrator = birthday_celebrator
+        self.public_holiday = public_holiday
+        self.zone_groups = zone_groups  # Callable returning the timezone groups holidays are announced per
+        # Number of days, starting today, to render messages for
+        self.days = int(days if days is not None else os.getenv("PREGENERATE_DAYS", 3))
+
+    def pregenerate(self, start_date=None):
+        # Render birthday wishes and holiday announcements for the next N days and store them
+        if self.days <= 0:
+            logger.info("Message pregeneration is disabled (PREGENERATE_DAYS=0)")
+            return {"birthday_wishes": 0, "holiday_days": 0}
+
+        started = time.monotonic()
+        start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else datetime.now()
+        dates = [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(self.days)]
+        self.birthday_celebrator.store.purge(dates[0])  # Messages for past days are never sent
+
+        # One indexed query for all birthdays in the window, then wishes grouped per day
+        birthdays_by_date = {}
+        for date, employee in self.birthday_celebrator.find_birthdays_in_range(dates[0], self.days):
+            birthdays_by_date.setdefault(date, []).append(employee)
+
+        wishes = 0
+        for date, employees in birthdays_by_date.items():
+            prepared = self.birthday_celebrator.prepare_birthday_wishes(employees, date)
+            wishes += sum(1 for wish in prepared if wish is not None)
+
+        holiday_days = 0
+        groups = self.zone_groups() if self.zone_groups is not None else [None]
+        for date in dates:
+            generated = [self.public_holiday.generate_holiday_message(date, group) for group in groups]
+            if any(isinstance(messages, list) and messages for messages in generated):
+                holiday_days += 1
+
+        logger.info(f"Pregenerated {wishes} birthday wish(es) and holiday announcements for {holiday_days} day(s) "
+                    f"from {dates[0]} to {dates[-1]} in {time.monotonic() - started:.2f}s")
+        return {"birthday_wishes": wishes, "holiday_days": holiday_days}
+
+
+if __name__ == "__main__":
+    setup_logging()
+    from happy_birthday import HappyBirthday
+    from public_holiday import PublicHoliday
+
+    parser = argparse.ArgumentParser(description='Pregenerate birthday and holiday messages for upcoming days.')
+    parser.add_argument('--date', type=str, help='First date to pregenerate for, format YYYY-MM-DD', default=None)
+    parser.add_argument('--days', type=int, help='Number of days to pregenerate', default=None)
+    args = parser.parse_args()
+
+    db = DBConnection()
+    webhook_url = os.getenv("WEBHOOK_URL")
+    pregenerator = MessagePregenerator(HappyBirthday(db, webhook_url), PublicHoliday(db, webhook_url), args.days)
+    pregenerator.pregenerate(args.date)
@@ -0,0 +1,46 @@
+from flask import Blueprint, jsonify, request, abort
+from pathlib import Path
+import hmac
+import sys
+import logging
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from config import get_config
+from job_profiling import get_job_profiler
+
+logger = logging.getLogger(__name__)
+
+# Create a Flask Blueprint for requesting job profiles
+profiling_endpoint = Blueprint('profiling', __name__)
+
+
+@profiling_endpoint.before_request
+def require_admin_token():
+    # Hidden unless ADMIN_TOKEN is set; callers send it as a bearer token
+    token = get_config().admin_token
+    if not token:
+        abort(404)
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        abort(403)
+
+
+@profiling_endpoint.route('/admin/profile', methods=['GET'])
+def list_profile_requests():
+    """Endpoint listing the job runs still waiting to be profiled"""
+    return jsonify(get_job_profiler().requested()), 200
+
+
+@profiling_endpoint.route('/admin/profile/<job_id>', methods=['POST'])
+def request_profile(job_id):
+    """Endpoint requesting a CPU and memory profile of the next runs of a job"""
+    runs = request.args.get('runs', default=1, type=int)
+    try:
+        get_job_profiler().request(job_id, runs)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(get_job_profiler().requested()), 200
@@ -1,7 +1,7 @@
 public_holiday_prompt_template = """
 YOU ARE AN EXPERT IN CREATING ENGAGING AND INFORMATIVE MESSAGES ABOUT PUBLIC HOLIDAYS. 
 YOUR TASK IS TO GENERATE A MESSAGE THAT INCLUDES THE HISTORICAL BACKGROUND OF A GIVEN HOLIDAY In particular location = {location_name} AND 
-SUGGESTIONS ON HOW TO BEST CELEBRATE IT specific location = {location_name}. USE THE PARAMETERS {holiday_date}, {holiday_name}, {location_name}, AND {location_code} 
+SUGGESTIONS ON HOW TO BEST CELEBRATE IT specific location = {location_name}. USE THE PARAMETERS {holiday_name}, {location_name}, AND {location_code} 
 TO PROVIDE RELEVANT INFORMATION. FORMAT THE RESPONSE TO BE READY TO SEND VIA GOOGLE CHAT WEBHOOK.
 
 **Key Objectives:**
@@ -13,7 +13,7 @@ TO PROVIDE RELEVANT INFORMATION. FORMAT THE RESPONSE TO BE READY TO SEND VIA GOO
 
 **Chain of Thoughts:**
 1. **Introduce the Holiday:**
-   - Mention the holiday's name and date.
+   - Mention the holiday's name.
    - Specify the location where the holiday is observed.
 
 2. **Historical Background:**
@@ -35,12 +35,13 @@ TO PROVIDE RELEVANT INFORMATION. FORMAT THE RESPONSE TO BE READY TO SEND VIA GOO
 - AVOID USING UNFORMATTED TEXT OR DEVIATING FROM THE SPECIFIED FORMAT.
 - NEVER IGNORE THE CULTURAL SIGNIFICANCE OR SENSITIVITIES OF THE HOLIDAY.
 - DO NOT EXCEED 560 CHARACTERS.
+- DO NOT MENTION THE DATE, IT IS ADDED TO THE MESSAGE SEPARATELY.
 
 **Example Message:**
 
 *Public Holiday Announcement:* *[national_holiday_name]*({holiday_name})
 
-Today *{holiday_date}* is a public holiday in the *{location_name}* ({location_code})*[national_holiday_name]*.
+Today is a public holiday in the *{location_name}* ({location_code})*[national_holiday_name]*.
 
 _Historical Background:_
 *[national_holiday_name]* celebrates [brief historical significance].
@@ -55,6 +56,18 @@ _Best Ways to Celebrate:_
 _Paysera Engineering AI Assistant_
 """
 
+# Used without the LLM, when it is unavailable or too slow; follows the example message above
+public_holiday_fallback_template = """*Public Holiday Announcement:* *{holiday_name}*
+
+Today *{holiday_date}* is a public holiday in the *{location_name}*.
+
+*Enjoy your day!*
+_Paysera Engineering AI Assistant_"""
+
+# Generated announcements carry no date, so they can be reused; it is put on top when the message is sent
+public_holiday_dated_template = """*{holiday_date}*
+{announcement}"""
+
 public_holiday_prompt_template_v2 = """
 YOU ARE AN EXPERT IN IDENTIFYING AND DIFFERENTIATING PUBLIC HOLIDAYS ACROSS VARIOUS LOCATIONS. YOUR TASK IS TO ANALYZE A GIVEN LIST OF PUBLIC HOLIDAY NAMES AND DETERMINE WHETHER THEY REFER TO THE SAME HOLIDAY CELEBRATED IN DIFFERENT LOCATIONS OR DISTINCT HOLIDAYS OCCURRING ON THE SAME DATE IN DIFFERENT LOCATIONS. USE THE FOLLOWING CRITERIA TO MAKE THIS DETERMINATION: (A) HISTORY OF THE HOLIDAY, (B) RITUALS OF CELEBRATION, (C) ESSENCE AND SIGNIFICANCE OF THE HOLIDAY.
 
@@ -141,6 +154,46 @@ YOU ARE AN EXPERT IN IDENTIFYING AND DIFFERENTIATING PUBLIC HOLIDAYS ACROSS VARI
 
 """
 
+public_holiday_structured_prompt_template = """
+YOU ARE AN EXPERT IN IDENTIFYING PUBLIC HOLIDAYS ACROSS LOCATIONS AND IN CREATING ENGAGING AND INFORMATIVE MESSAGES ABOUT THEM.
+YOU WILL RECEIVE A JSON LIST OF TODAY'S PUBLIC HOLIDAYS, EACH WITH holiday_name, location_name AND location_code.
+IN ONE ANSWER, GROUP THE HOLIDAYS AND WRITE ONE ANNOUNCEMENT PER GROUP. RETURN ONLY JSON THAT MATCHES THE PROVIDED SCHEMA.
+
+###INSTRUCTIONS###
+
+- GROUP HOLIDAYS THAT ARE THE SAME HOLIDAY CELEBRATED IN DIFFERENT LOCATIONS, JUDGING BY (A) HISTORY, (B) RITUALS OF CELEBRATION, (C) ESSENCE AND SIGNIFICANCE.
+- KEEP DISTINCT HOLIDAYS IN SEPARATE GROUPS, EVEN IF THEY FALL ON THE SAME DATE.
+- EVERY location_name FROM THE INPUT MUST APPEAR IN EXACTLY ONE GROUP, SPELLED EXACTLY AS IN THE INPUT.
+- FOR EACH GROUP SET holiday_name TO A COMMON ENGLISH NAME OF THE HOLIDAY AND locations TO THE LIST OF ITS location_name VALUES.
+- FOR EACH GROUP WRITE announcement: A MESSAGE READY TO SEND VIA GOOGLE CHAT WEBHOOK, LIMITED TO 560 CHARACTERS, WITH
+  A BRIEF HISTORICAL BACKGROUND, SUGGESTIONS ON HOW TO CELEBRATE IT AND THE HOLIDAY NAME TRANSLATED TO THE NATIVE LANGUAGE OF THE LOCATIONS.
+
+###Announcement Format###
+
+*Public Holiday Announcement:* *[national_holiday_name]*([holiday_name])
+
+Today is a public holiday in the *[locations]*.
+
+_Historical Background:_
+*[national_holiday_name]* celebrates [brief historical significance].
+
+_Best Ways to Celebrate:_
+1. *Traditional Activities:* [mention traditions].
+2. *Community Events:* Join local festivities.
+3. *Cultural Experiences:* Explore exhibits or performances.
+4. *Reflect and Appreciate:* Reflect on its historical importance.
+
+*Enjoy you day!* 
+_Paysera Engineering AI Assistant_
+
+###What Not To Do###
+
+- NEVER PROVIDE INACCURATE OR UNSUBSTANTIATED HISTORICAL INFORMATION.
+- NEVER LEAVE A LOCATION OUT OR PUT IT IN TWO GROUPS.
+- NEVER RETURN ANYTHING BUT THE JSON OBJECT.
+- NEVER MENTION THE DATE IN AN ANNOUNCEMENT, IT IS ADDED SEPARATELY.
+"""
+
 
 HB_prompt_template = """YOU ARE THE PAYSERA ENGINEERING AI ASSISTANT. YOUR TASK IS TO CREATE A UNIQUE HAPPY BIRTHDAY MESSAGE FOR AN EMPLOYEE WITH THIS DATA CONTEXT = {employee_data}.
 THE MESSAGE SHOULD REFLECT THEIR SPECIFIC ROLE, DEPARTMENT, AND TENURE AT THE COMPANY. USE A CREATIVE, FUN STYLE WITH GENERAL IT MEMES, JARGON, AND SUITABLE EMOJIS. 
@@ -196,3 +249,8 @@ Best regards,
 !!!USE THIS TEMPLATE TO CRAFT BIRTHDAY WISHES AND SEND THEM TO THE CORPORATE GOOGLE CHAT!!!"""
 
 
+# Used without the LLM, when it is unavailable or too slow; follows the format example above
+HB_fallback_template = """🎉 Happy Birthday! 🎂 Your *{department}* crew is thrilled to celebrate another year of your amazing *{position_name}* skills! Today we celebrate your *{birthdays}* at Paysera together! Your contributions have been legendary. Keep rocking! 🚀💻
+
+Best regards,
+*_Paysera Engineering AI Assistant_*"""
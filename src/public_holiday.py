@@ -1,41 +1,93 @@
 import datetime
 import logging
 import os
-from dotenv import load_dotenv
 from pathlib import Path
 from db_functions import DBConnection
 from google_space_webhook import GoogleChatWebhook
 from logging_config import setup_logging
-from prompt_templates import public_holiday_prompt_template, public_holiday_prompt_template_v2
+from prompt_templates import public_holiday_prompt_template, public_holiday_prompt_template_v2, public_holiday_structured_prompt_template, public_holiday_fallback_template, public_holiday_dated_template
 from openai_api import OpenAI_API
+from generation_executor import GenerationExecutor
+from message_store import MessageStore, fingerprint
+from metrics import TEMPLATE_FALLBACKS, HOLIDAY_GROUPS
+from holiday_grouping import HolidayGrouper, normalize
 import json
 import re
 
-# Load environment variables and setup logging
-load_dotenv()
-setup_logging()
+
+# Holidays on a given date with the policy (location) they belong to
+FIND_HOLIDAYS_QUERY = """
+        SELECT h.name AS holiday_name, p.name AS location_name, p.country_code AS location_code, h.occurs_on AS holiday_date,
+               p.id AS holiday_policy_id
+        FROM All_Holidays AS h
+        JOIN HolidayPolicies AS p ON h.holiday_policy_id = p.id
+        WHERE h.occurs_on = ?
+        """
+# Timezone of every location and the holiday policy it follows; Locations is small, so this reads all of it
+POLICY_TIME_ZONES_SELECT = "SELECT holiday_policy_id, time_zone FROM Locations ORDER BY id"
+
+# Strict JSON schema for the single-call grouping and announcement mode
+HOLIDAY_ANNOUNCEMENTS_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "holiday_announcements",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "holidays": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "holiday_name": {"type": "string"},
+                            "locations": {"type": "array", "items": {"type": "string"}},
+                            "announcement": {"type": "string"}
+                        },
+                        "required": ["holiday_name", "locations", "announcement"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["holidays"],
+            "additionalProperties": False
+        }
+    }
+}
 
 class PublicHoliday:
-    def __init__(self, db_connection, webhook_url):
+    def __init__(self, db_connection, webhook_url, executor=None, store=None, outbox=None):
         self.db = db_connection
         self.webhook = GoogleChatWebhook(webhook_url)  # Initialize webhook
         self.api = OpenAI_API()  # Initialize OpenAI API
+        self.executor = executor or GenerationExecutor()  # Shared executor for parallel LLM calls
+        self.store = store or MessageStore(db_connection)  # Pregenerated announcements, reused at send time
+        self.outbox = outbox  # Durable delivery queue; without it messages are posted directly
+        # 'structured' asks for grouping and announcements in one JSON call, 'legacy' uses one call per group
+        self.generation_mode = os.getenv("HOLIDAY_GENERATION_MODE", "structured").lower()
+        self.announcement_max_chars = int(os.getenv("HOLIDAY_ANNOUNCEMENT_MAX_CHARS", 1500))
+        self.grouper = HolidayGrouper()  # Groups holidays locally; the LLM only sees the ones it is unsure about
         logging.info("PublicHoliday initialized with given database connection, webhook URL, and OpenAI API.")
 
-    def find_holidays(self, date=None):  # type: (str | None) -> list[dict] | None
+    def policy_time_zones(self):
+        # A policy follows the timezone of its first location; policies without locations have none
+        zones = {}
+        for row in self.db.execute(POLICY_TIME_ZONES_SELECT):
+            zones.setdefault(row['holiday_policy_id'], row['time_zone'])
+        return zones
+
+    def find_holidays(self, date=None, zone_group=None):  # type: (str | None, object) -> list[dict] | None
+        # With a zone_group only holidays of policies whose locations are in that timezone group are returned
         logging.debug(f"find_holidays called with date: {date}")
         if date is None:
             date = datetime.datetime.now().strftime('%Y-%m-%d')  # Default to today's date
         logging.info(f"Searching for public holidays on: {date}")
-        query = """
-        SELECT h.name AS holiday_name, p.name AS location_name, p.country_code AS location_code, h.occurs_on AS holiday_date
-        FROM All_Holidays AS h
-        JOIN HolidayPolicies AS p ON h.holiday_policy_id = p.id
-        WHERE h.occurs_on = ?
-        """
         try:
-            result = self.db.execute(query, (date,))
+            result = self.db.execute(FIND_HOLIDAYS_QUERY, (date,))
             holidays = result
+            if zone_group is not None and holidays:
+                policy_zones = self.policy_time_zones()
+                holidays = [row for row in holidays if zone_group.contains(policy_zones.get(row['holiday_policy_id']))]
             if not holidays:
                 logging.info("No public holidays found.")
                 return []
@@ -46,7 +98,7 @@ class PublicHoliday:
             logging.error("Error finding holidays", exc_info=True)
             return []  # Return empty list instead of None
 
-    def determine_holiday_similarity(self, holidays):
+    def determine_holiday_similarity(self, holidays, deadline=None):
         if not holidays:
             logging.info("No holidays to check for similarity.")
             return None
@@ -54,7 +106,7 @@ class PublicHoliday:
         logging.debug(f"Holiday list for similarity check: {holidays}")
 
         # Convert the list of holidays to a string
-        holidays_str = json.dumps(holidays, indent=2)
+        holidays_str = json.dumps(self._without_date(holidays), indent=2)
         
         # Form the request for OpenAI
         try:
@@ -68,7 +120,7 @@ class PublicHoliday:
         # Send the request to OpenAI API
         prompt_data = [{"role": "user", "content": prompt}]
         try:
-            response = self.api.chat_completion(prompt_data)
+            response = self.api.chat_completion(prompt_data, use_case="holiday_similarity", deadline=deadline)
         except Exception as e:
             logging.error(f"Error calling OpenAI API: {e}")
             return None
@@ -82,6 +134,18 @@ class PublicHoliday:
             logging.error("AI did not return a valid response for holiday similarity")
             return None
 
+    @staticmethod
+    def _without_date(holidays):
+        # Holiday prompts leave the date out, so their LLM cache keys do not change with it
+        return [{key: value for key, value in holiday.items() if key != 'holiday_date'} for holiday in holidays]
+
+    @staticmethod
+    def _with_date(message, holiday_date):
+        # The date is added around the generated text rather than written by the model
+        if not isinstance(message, str):
+            return message
+        return public_holiday_dated_template.format(holiday_date=holiday_date, announcement=message)
+
     def _check_api_response(self, response):
         if 'choices' in response and response['choices'] and 'message' in response['choices'][0] and 'content' in response['choices'][0]['message']:
             return response['choices'][0]['message']['content']
@@ -89,25 +153,123 @@ class PublicHoliday:
             logging.error("API did not return a valid response or missing 'content'")
             return None
 
-    def generate_holiday_message(self, date=None):  # type: (str | None) -> list[str] | str
+    def generate_holiday_message(self, date=None, zone_group=None, deadline=None):  # type: (str | None, object, object) -> list[tuple[str, str]] | str
+        # Returns (item_key, announcement) pairs, see announcement_key(), or a notice string.
+        # Announcements that cannot be generated (OpenAI failing, or the deadline passed) are rendered from a template
         logging.debug(f"generate_holiday_message called with date: {date}")
         if date is None:
             date = datetime.datetime.now().strftime('%Y-%m-%d')
         
-        holidays = self.find_holidays(date)
+        holidays = self.find_holidays(date, zone_group)
         if holidays is None:
             message = f"Error occurred while finding holidays for date: {date}"
             logging.error(message)
             return message
         if not holidays:
+            if zone_group is not None and not (zone_group.is_default and not self.find_holidays(date)):
+                # Only the default timezone group reports a day without holidays anywhere
+                return []
             message = f"On {date} there are no public holidays in Paysera locations."
             logging.info(message)
             return message
 
-        similarity_response = self.determine_holiday_similarity(holidays)
-        if similarity_response is None:
-            return "Error in determining holiday similarity."
+        # Reuse announcements rendered ahead of time as long as the day's holidays did not change
+        holidays_fingerprint = fingerprint('holiday_message', 'keyed', date, holidays, self.generation_mode,
+                                           public_holiday_prompt_template, public_holiday_prompt_template_v2,
+                                           public_holiday_structured_prompt_template)
+        item_key = zone_group.key if zone_group is not None else 'all'
+        stored = self.store.get('holiday_message', date, item_key, holidays_fingerprint)
+        if stored is not None:
+            logging.info(f"Using {len(stored)} pregenerated holiday announcement(s) for {date}.")
+            return [tuple(announcement) for announcement in stored]
+
+        generated = None
+        if self.generation_mode == 'structured':
+            generated = self.generate_structured_announcements(holidays, deadline)
+        if generated is None:
+            generated = self.generate_legacy_announcements(holidays, deadline)
+        messages, complete = generated
+
+        if complete and messages:
+            # Only a complete set is stored, a partial one is regenerated next time
+            self.store.put('holiday_message', date, item_key, holidays_fingerprint, messages)
+        return messages
+
+    def generate_announcement(self, holiday, holiday_date, deadline=None):
+        # Generate the announcement for one group of holidays with its own LLM call
+        locations = ', '.join(holiday['locations'])
+        prompt = public_holiday_prompt_template.format(
+            holiday_name=holiday['holiday_name'],
+            location_name=locations,
+            location_code=''  # Not needed as we list all locations
+        )
+        prompt_data = [{"role": "user", "content": prompt}]
+        response = self.api.chat_completion(prompt_data, use_case="holiday_message", deadline=deadline)
+        logging.debug(f"API response: {response}")
+        return self._with_date(self._check_api_response(response), holiday_date)
+
+    @staticmethod
+    def announcement_key(group):
+        # Outbox item key of a group's announcement, from what the group is about rather than its position,
+        # so a regenerated set that is ordered or grouped differently does not resend or skip announcements
+        return fingerprint('holiday_group', normalize(group['holiday_name']), sorted(group['locations']))[:16]
+
+    @staticmethod
+    def template_announcement(holiday, holiday_date):
+        # Announcement rendered without the LLM from the group's name, locations and date
+        return public_holiday_fallback_template.format(holiday_name=holiday['holiday_name'], holiday_date=holiday_date,
+                                                       location_name=', '.join(holiday['locations']))
 
+    def generate_announcements(self, groups, holiday_date, deadline=None):
+        # Generate announcements for all groups in parallel, keeping the original order.
+        # Returns ((item_key, message) pairs, complete) where complete is False if any group fell back to the template.
+        messages = []
+        complete = True
+        results = self.executor.map(lambda holiday: self.generate_announcement(holiday, holiday_date, deadline), groups,
+                                    deadline=deadline)
+        for holiday, result in zip(groups, results):
+            message = result.value
+            if not result.ok or not isinstance(message, str):
+                error = result.error if not result.ok else "generated message is not a string"
+                logging.error(f"Failed to generate announcement for holiday '{holiday['holiday_name']}': {error}; "
+                              f"using the template")
+                TEMPLATE_FALLBACKS.labels(job="holiday_message").inc()
+                messages.append((self.announcement_key(holiday), self.template_announcement(holiday, holiday_date)))
+                complete = False
+                continue
+
+            messages.append((self.announcement_key(holiday), message))
+            logging.info(f"Announcement for holiday '{holiday['holiday_name']}' generated.")
+        return messages, complete
+
+    def generate_legacy_announcements(self, holidays, deadline=None):
+        # Group the holidays, locally where possible, then one call per group
+        groups, complete = self.group_holidays(holidays, deadline)
+        messages, generated_complete = self.generate_announcements(groups, holidays[0]['holiday_date'], deadline)
+        return messages, complete and generated_complete
+
+    def group_holidays(self, holidays, deadline=None):
+        # Returns (groups, complete). Holidays the local grouper cannot settle go through the similarity call;
+        # if that fails they are kept in their local groups and the result is reported as incomplete
+        groups, uncertain = self.grouper.group(holidays)
+        HOLIDAY_GROUPS.labels(method="local").inc(len(groups))
+        if not uncertain:
+            return groups, True
+
+        leftovers = [holiday for group in uncertain for holiday in group.holidays]
+        llm_groups = self.parse_similarity_groups(self.determine_holiday_similarity(leftovers, deadline), leftovers)
+        if llm_groups is None:
+            logging.warning(f"Keeping {len(uncertain)} uncertain holiday group(s) apart")
+            HOLIDAY_GROUPS.labels(method="local").inc(len(uncertain))
+            return groups + [group.as_dict() for group in uncertain], False
+        HOLIDAY_GROUPS.labels(method="llm").inc(len(llm_groups))
+        return groups + llm_groups, True
+
+    def parse_similarity_groups(self, similarity_response, holidays):
+        # Groups from the similarity response, restricted to the given holidays' locations; locations the model
+        # left out get a group of their own per holiday name. None when the response cannot be used.
+        if similarity_response is None:
+            return None
         try:
             # Извлекаем JSON из ответа OpenAI
             json_match = re.search(r'```json\n(.*?)\n```', similarity_response, re.DOTALL)
@@ -121,34 +283,103 @@ class PublicHoliday:
                 raise KeyError("'holidays' key not found in similarity data")
         except (json.JSONDecodeError, KeyError, ValueError) as e:
             logging.error(f"Error processing holiday similarity response: {e}", exc_info=True)
-            return "Error in processing holiday similarity response."
+            return None
 
         logging.debug(f"Similarity data: {similarity_data}")
+        known_locations = {holiday['location_name'] for holiday in holidays}
+        covered_locations = set()
+        groups = []
+        for group in similarity_data['holidays']:
+            if not isinstance(group, dict) or not isinstance(group.get('locations'), list):
+                continue
+            locations = [location for location in group['locations']
+                         if location in known_locations and location not in covered_locations]
+            if locations and group.get('holiday_name'):
+                covered_locations.update(locations)
+                groups.append({'holiday_name': group['holiday_name'], 'locations': locations})
+        missing = {}
+        for holiday in holidays:
+            if holiday['location_name'] not in covered_locations:
+                missing.setdefault(holiday['holiday_name'], []).append(holiday['location_name'])
+        groups.extend({'holiday_name': name, 'locations': locations} for name, locations in missing.items())
+        return groups
 
-        messages = []
-        for holiday in similarity_data['holidays']:
-            locations = ', '.join(holiday['locations'])
-            prompt = public_holiday_prompt_template.format(
-                holiday_date=holidays[0]['holiday_date'],
-                holiday_name=holiday['holiday_name'],
-                location_name=locations,
-                location_code=''  # Not needed as we list all locations
-            )
-            prompt_data = [{"role": "user", "content": prompt}]
-            response = self.api.chat_completion(prompt_data)
-            logging.debug(f"API response: {response}")
-
-            message = self._check_api_response(response)
-            if not isinstance(message, str):
-                logging.error("Generated message is not a string")
+    def _validate_announcement_group(self, group, known_locations, covered_locations):
+        # Return a description of what is wrong with a structured group, or None if it is valid
+        if not isinstance(group, dict):
+            return "group is not an object"
+        if not isinstance(group.get('holiday_name'), str) or not group['holiday_name'].strip():
+            return "missing holiday_name"
+        locations = group.get('locations')
+        if not isinstance(locations, list) or not locations or not all(isinstance(item, str) for item in locations):
+            return "missing locations"
+        unknown = [location for location in locations if location not in known_locations]
+        if unknown:
+            return f"unknown locations {unknown}"
+        duplicated = [location for location in locations if location in covered_locations]
+        if duplicated:
+            return f"locations already used by another group {duplicated}"
+        announcement = group.get('announcement')
+        if not isinstance(announcement, str) or not announcement.strip():
+            return "empty announcement"
+        if len(announcement) > self.announcement_max_chars:
+            return f"announcement longer than {self.announcement_max_chars} characters"
+        return None
+
+    def generate_structured_announcements(self, holidays, deadline=None):
+        # Ask once, in JSON schema mode, for the grouping and every announcement.
+        # Returns (messages, complete), or None when the response cannot be used at all.
+        holiday_date = holidays[0]['holiday_date']
+        prompt = (public_holiday_structured_prompt_template + "\n\nHoliday list:\n"
+                  + json.dumps(self._without_date(holidays), indent=2))
+        prompt_data = [{"role": "user", "content": prompt}]
+        try:
+            response = self.api.chat_completion(prompt_data, use_case="holiday_announcements",
+                                                response_format=HOLIDAY_ANNOUNCEMENTS_FORMAT, deadline=deadline)
+            content = self._check_api_response(response)
+            if content is None:
+                raise ValueError("empty response")
+            groups = json.loads(content)['holidays']
+            if not isinstance(groups, list):
+                raise ValueError("'holidays' is not a list")
+        except Exception as e:
+            logging.error(f"Structured holiday generation failed, falling back to per-group calls: {e}")
+            return None
+
+        known_locations = {holiday['location_name'] for holiday in holidays}
+        covered_locations = set()
+        slots = []  # (item_key, announcement text), or the group that needs its own call
+        for group in groups:
+            error = self._validate_announcement_group(group, known_locations, covered_locations)
+            if error is None:
+                covered_locations.update(group['locations'])
+                slots.append((self.announcement_key(group), self._with_date(group['announcement'], holiday_date)))
                 continue
+            logging.warning(f"Structured holiday group failed validation ({error}): {group}")
+            if error == "empty announcement" or error.startswith("announcement longer"):
+                # Grouping is fine, only the text needs to be regenerated
+                covered_locations.update(group['locations'])
+                slots.append({'holiday_name': group['holiday_name'], 'locations': group['locations']})
 
-            messages.append(message)
-            logging.info(f"Announcement for holiday '{holiday['holiday_name']}' generated.")
-        return messages
+        # Locations the model left out are announced per holiday name from the input
+        missing = {}
+        for holiday in holidays:
+            if holiday['location_name'] not in covered_locations:
+                missing.setdefault(holiday['holiday_name'], []).append(holiday['location_name'])
+        slots.extend({'holiday_name': name, 'locations': locations} for name, locations in missing.items())
+
+        fallback_groups = [slot for slot in slots if isinstance(slot, dict)]
+        if fallback_groups:
+            logging.info(f"Generating {len(fallback_groups)} holiday announcement(s) with per-group fallback calls")
+        fallback_messages, complete = self.generate_announcements(fallback_groups, holiday_date, deadline)
+        fallback_iter = iter(fallback_messages)
+        messages = [slot if isinstance(slot, tuple) else next(fallback_iter) for slot in slots]
+        logging.info(f"Generated {len(messages)} holiday announcement(s) with one structured call "
+                     f"and {len(fallback_groups)} fallback call(s)")
+        return messages, complete
 
-    def generate_and_send_holiday_message(self, date=None):
-        raw_messages = self.generate_holiday_message(date)
+    def generate_and_send_holiday_message(self, date=None, zone_group=None, deadline=None):
+        raw_messages = self.generate_holiday_message(date, zone_group, deadline)
         if isinstance(raw_messages, str):
             if "Error" in raw_messages:
                 logging.error(raw_messages)
@@ -158,14 +389,23 @@ class PublicHoliday:
             logging.info(f"Message sent status: {response.status_code if hasattr(response, 'status_code') else 'No status code available'}")
             return response
         else:
-            responses = []
-            for raw_message in raw_messages:
-                response = self.webhook.send_message(raw_message)
-                logging.info(f"Message sent status: {response.status_code if hasattr(response, 'status_code') else 'No status code available'}")
-                responses.append(response)
-            return responses
+            # One delivery result per announcement, sent as a batch within the webhook rate limit
+            day = date or datetime.datetime.now().strftime('%Y-%m-%d')
+            if self.outbox is not None:
+                # Announcements are keyed by their group, so a rerun queues only the ones not queued before
+                queued = self.outbox.enqueue_messages("holiday_message", day, raw_messages, self.webhook.url,
+                                                      thread_key=f"holidays-{day}", title="Public holidays",
+                                                      route=zone_group.key if zone_group is not None else None)
+                logging.info(f"Queued {queued} holiday message(s) for delivery.")
+                return queued
+            results = self.webhook.send_messages([message for _, message in raw_messages], thread_key=f"holidays-{day}",
+                                                 title="Public holidays")
+            for result in results:
+                logging.info(f"Message sent status: {result.status_code if result.status_code is not None else 'No status code available'}")
+            return results
 
 if __name__ == "__main__":
+    setup_logging()
     db = DBConnection()
     webhook_url = os.getenv("WEBHOOK_URL")  # Get the webhook URL from environment variables
     public_holiday = PublicHoliday(db, webhook_url)
@@ -0,0 +1,123 @@
+import re
+import ast
+import sys
+import sqlite3
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from logging_config import setup_logging
+from db_functions import create_database
+from happy_birthday import HappyBirthday
+from llm_cache import LLMCache
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DIR = Path(__file__).resolve().parent
+# A module-level string constant holding one of these statements is a production query
+SQL_STATEMENT = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+# A plan step that walks a whole table (or a whole index) instead of searching it
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)')
+
+# Queries that read every row on purpose, by constant name, with the reason
+FULL_SCAN_EXEMPTIONS = {
+    "POLICY_TIME_ZONES_SELECT": "Locations has one row per office",
+    "LOCATION_TIME_ZONES_SELECT": "Locations has one row per office",
+    "KNOWN_UPDATED_AT_SELECT": "delta sync compares every stored updated_at",
+    "DEACTIVATE_MISSING_UPDATE": "every employee outside the imported set is checked",
+    "STATUS_COUNTS_SELECT": "counts every outbox entry by status, for the stats endpoint",
+    "ENTRY_COUNT_SELECT": "counts every LLM cache entry for eviction and stats",
+    "LEAST_RECENTLY_USED_DELETE": "walks the last_access index in order, only up to the overflow",
+}
+
+
+def sql_constants(source_dir=SOURCE_DIR):
+    # {(module, name): sql} for every module-level string constant in the application that is a SQL statement
+    constants = {}
+    for path in sorted(source_dir.glob("*.py")):
+        for node in ast.parse(path.read_text()).body:
+            if not isinstance(node, ast.Assign) or not isinstance(node.value, ast.Constant):
+                continue
+            if not isinstance(node.value.value, str) or not SQL_STATEMENT.match(node.value.value):
+                continue
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id.isupper():
+                    constants[(path.stem, target.id)] = node.value.value
+    return constants
+
+
+def production_queries(source_dir=SOURCE_DIR):
+    # (name, sql, sample params) for every query the application runs against its tables
+    queries = [
+        ("find_birthdays", HappyBirthday.birthdays_query(1), ('10-18',)),
+        ("find_birthdays_feb29", HappyBirthday.birthdays_query(2), ('02-28', '02-29')),
+        ("find_birthdays_in_range", HappyBirthday.birthdays_query(7),
+         ('10-18', '10-19', '10-20', '10-21', '10-22', '10-23', '10-24')),
+    ]
+    for (module, name), sql in sql_constants(source_dir).items():
+        sql = sql.replace('{placeholders}', '?, ?')
+        # Plans do not depend on the values, only on which columns are compared
+        queries.append((name, sql, (None,) * sql.count('?')))
+    return queries
+
+
+def explain(conn, sql, params=()):
+    # Return the detail column of every EXPLAIN QUERY PLAN step
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def create_schema(db_path):
+    # Every table the queries run against: the app database and the LLM cache's table
+    create_database(db_path)
+    cache = LLMCache(db_path=db_path)
+    cache.db.close()
+
+
+def check_query_plans(db_path=None, queries=None):
+    # Explain every production query. Returns (failures, exempted): queries that fall back to a full scan,
+    # and the exempted ones that do so on purpose, each as (name, scans)
+    queries = queries or production_queries()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if db_path is None:
+            db_path = Path(tmp_dir) / 'query_plan_check.db'
+            create_schema(db_path)
+
+        failures, exempted = [], []
+        with sqlite3.connect(db_path) as conn:
+            for name, sql, params in queries:
+                plan = explain(conn, sql, params)
+                scans = [step for step in plan if FULL_SCAN.match(step)]
+                logger.info(f"{name}: {' | '.join(plan)}")
+                if not scans:
+                    continue
+                if name in FULL_SCAN_EXEMPTIONS:
+                    logger.info(f"Query '{name}' scans on purpose ({FULL_SCAN_EXEMPTIONS[name]}): {scans}")
+                    exempted.append((name, scans))
+                else:
+                    logger.error(f"Query '{name}' falls back to a full scan: {scans}")
+                    failures.append((name, scans))
+    return failures, exempted
+
+
+if __name__ == "__main__":
+    setup_logging()
+    parser = argparse.ArgumentParser(description='Fail if any production query falls back to a full table scan.')
+    parser.add_argument('--db', type=str, help='Database to check, defaults to a fresh database from create_database',
+                        default=None)
+    args = parser.parse_args()
+
+    queries = production_queries()
+    failures, exempted = check_query_plans(args.db, queries)
+    for name, scans in exempted:
+        print(f"Exempted full scan in {name} ({FULL_SCAN_EXEMPTIONS[name]}): {'; '.join(scans)}")
+    if failures:
+        print(f"{len(failures)} query plan regression(s): {', '.join(name for name, _ in failures)}")
+        sys.exit(1)
+    print(f"{len(queries)} production queries checked: {len(queries) - len(exempted)} use indexes or need no "
+          f"table access, {len(exempted)} exempted full scan(s).")
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+logger = logging.getLogger(__name__)
+
+
+class ReadinessChecker:
+    # Runs dependency checks concurrently and caches the combined result so probes rarely reach upstream
+    def __init__(self, checks, cache_ttl=None, max_stale=None, check_timeout=None):
+        self.checks = checks  # name -> callable(timeout) returning True when the dependency is usable
+        self.cache_ttl = float(cache_ttl or os.getenv("READINESS_CACHE_TTL", 15))
+        # Up to this age a cached result is still served while a background refresh runs
+        self.max_stale = float(max_stale or os.getenv("READINESS_MAX_STALE", 60))
+        self.check_timeout = float(check_timeout or os.getenv("READINESS_CHECK_TIMEOUT", 2))
+        # Spare workers so a check stuck past its deadline does not block the next refresh
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(checks), thread_name_prefix="readiness")
+        self._lock = threading.Lock()
+        self._inflight = None  # Event of the refresh currently running, shared by every waiting probe
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def _run_check(self, check):
+        started = time.monotonic()
+        try:
+            ok = bool(check(self.check_timeout))
+            return {"status": "ok" if ok else "down", "latency_ms": round((time.monotonic() - started) * 1000, 1)}
+        except Exception as e:
+            return {"status": "down", "latency_ms": round((time.monotonic() - started) * 1000, 1),
+                    "error": str(e)}
+
+    def _run_checks(self):
+        futures = {name: self._executor.submit(self._run_check, check) for name, check in self.checks.items()}
+        wait(futures.values(), timeout=self.check_timeout)
+        results = {}
+        for name, future in futures.items():
+            if future.done():
+                results[name] = future.result()
+            else:
+                results[name] = {"status": "timeout", "latency_ms": self.check_timeout * 1000}
+        ready = all(result["status"] == "ok" for result in results.values())
+        for name, result in results.items():
+            if result["status"] != "ok":
+                logger.error(f"Readiness check '{name}' failed: {result}")
+        return {"status": "ready" if ready else "not_ready", "checked_at": datetime.utcnow().isoformat(),
+                "checks": results}
+
+    def _refresh(self, done):
+        try:
+            snapshot = self._run_checks()
+            with self._lock:
+                self._snapshot = snapshot
+                self._checked_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Readiness refresh failed: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._inflight = None
+            done.set()
+
+    def _start_refresh(self):
+        # Single flight: concurrent callers share the refresh that is already running
+        with self._lock:
+            if self._inflight is not None:
+                return self._inflight
+            done = threading.Event()
+            self._inflight = done
+        threading.Thread(target=self._refresh, args=(done,), name="readiness-refresh", daemon=True).start()
+        return done
+
+    def status(self):
+        # Return the latest readiness result, refreshing it if it is too old
+        with self._lock:
+            snapshot = self._snapshot
+            age = time.monotonic() - self._checked_at
+        if snapshot is not None and age < self.cache_ttl:
+            return snapshot, age
+        if snapshot is not None and age < self.max_stale:
+            self._start_refresh()
+            return snapshot, age
+        self._start_refresh().wait(self.check_timeout + 1)
+        with self._lock:
+            if self._snapshot is None:
+                return {"status": "not_ready", "checked_at": None, "checks": {}}, None
+            return self._snapshot, time.monotonic() - self._checked_at
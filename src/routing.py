@@ -0,0 +1,80 @@
+import sys
+import json
+import logging
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+logger = logging.getLogger(__name__)
+
+# Employee columns a route can match on, by routing table key
+ROUTE_FIELDS = {"division": "division", "department": "department", "location": "location_name"}
+
+
+def _values(value):
+    if value is None:
+        return None
+    return frozenset([value] if isinstance(value, str) else value)
+
+
+class Route:
+    # One Google Chat space and the employees it receives messages about; every given criterion must match
+    def __init__(self, name, webhook_url, division=None, department=None, location=None):
+        if not webhook_url:
+            raise ValueError(f"Route {name} has no webhook_url")
+        self.name = name
+        self.webhook_url = webhook_url
+        self.criteria = {field: values for field, values in (("division", _values(division)),
+                                                             ("department", _values(department)),
+                                                             ("location", _values(location))) if values}
+
+    def matches(self, employee):
+        return all(employee[ROUTE_FIELDS[field]] in values for field, values in self.criteria.items())
+
+    def describe(self):
+        # Human readable audience, e.g. for "no birthdays at ... today"
+        return ", ".join(sorted(value for values in self.criteria.values() for value in values)) or self.name
+
+
+class RoutingTable:
+    # Maps employees to the spaces that should hear about them; an employee may match several routes.
+    # An implicit table is the single default route used when no WEBHOOK_ROUTES are configured
+    def __init__(self, routes, implicit=False):
+        if not routes:
+            raise ValueError("A routing table needs at least one route")
+        names = [route.name for route in routes]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Route names must be unique: {names}")
+        self.routes = list(routes)
+        self.implicit = implicit
+
+    @classmethod
+    def from_json(cls, text):
+        # [{"name": "engineering", "division": "Paysera Engineering", "webhook_url": "https://..."}, ...]
+        entries = json.loads(text)
+        return cls([Route(entry.get("name") or f"route-{index}", entry.get("webhook_url"), entry.get("division"),
+                          entry.get("department"), entry.get("location"))
+                    for index, entry in enumerate(entries, start=1)])
+
+    def partition(self, employees):
+        # [(route, employees)] for every route, in routing table order; employees keep their order
+        return [(route, [employee for employee in employees if route.matches(employee)]) for route in self.routes]
+
+    def routed(self, employees):
+        # Employees matched by at least one route
+        return [employee for employee in employees if any(route.matches(employee) for route in self.routes)]
+
+
+def load_routing_table(config, default_division):
+    # WEBHOOK_ROUTES holds the routing table as JSON, or the path of a JSON file;
+    # without it everything goes to WEBHOOK_URL for the default division, as before
+    routes = config.webhook_routes
+    if not routes:
+        return RoutingTable([Route("default", config.webhook_url, division=default_division)], implicit=True)
+    if not routes.lstrip().startswith('['):
+        routes = Path(routes).read_text()
+    table = RoutingTable.from_json(routes)
+    logger.info(f"Loaded {len(table.routes)} webhook route(s): {', '.join(route.name for route in table.routes)}")
+    return table
@@ -0,0 +1,182 @@
+import sys
+import time
+import atexit
+import signal
+import logging
+import argparse
+import threading
+import multiprocessing
+from pathlib import Path
+from wsgiref.simple_server import make_server, WSGIRequestHandler
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from config import get_config
+from logging_config import setup_logging
+from main import create_app, start_background_work, scheduler, startup_timer
+from services import get_services
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("all", "web", "scheduler")
+RESTART_DELAY = 5  # Seconds before a role process that died is started again
+
+
+class _LoggingRequestHandler(WSGIRequestHandler):
+    # Send the scheduler endpoints' access log through logging instead of stderr
+    def log_message(self, format, *args):
+        logger.debug("Scheduler endpoint: " + format % args)
+
+
+def _stop_on_signals(stop):
+    def handler(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        stop.set()
+    signal.signal(signal.SIGTERM, handler)
+    signal.signal(signal.SIGINT, handler)
+
+
+def run_scheduler():
+    # Scheduler role: jobs, the outbox worker and the leader lease. The admin and metrics endpoints for this
+    # work are served here too, on SCHEDULER_PORT, since profiling and job metrics are per process.
+    setup_logging()
+    config = get_config()
+    stop = threading.Event()
+    _stop_on_signals(stop)
+    logger.info("Starting the scheduler process")
+    start_background_work()
+    server = None
+    if config.scheduler_port:
+        server = make_server(config.web_host, config.scheduler_port, create_app(admin=True),
+                             handler_class=_LoggingRequestHandler)
+        threading.Thread(target=server.serve_forever, name="scheduler-http", daemon=True).start()
+        logger.info(f"Scheduler endpoints listening on {config.web_host}:{config.scheduler_port}")
+    startup_timer.log_report()
+    while not stop.wait(1):
+        pass
+    if server is not None:
+        server.shutdown()
+    if scheduler.running:
+        scheduler.shutdown()  # Waits for running jobs
+    outbox_worker = get_services().outbox_worker
+    if outbox_worker is not None:
+        outbox_worker.stop()
+    # Released here rather than at exit: multiprocessing children skip atexit handlers
+    leader_lease = get_services().leader_lease
+    if leader_lease is not None:
+        atexit.unregister(leader_lease.stop)
+        leader_lease.stop()
+    logger.info("Scheduler process stopped")
+
+
+class Supervisor:
+    # Runs each role in its own child process and restarts one that dies. The web server and the scheduler
+    # are siblings, so jobs never share a GIL with request threads and the server never reaps the scheduler.
+    def __init__(self, roles, restart_delay=RESTART_DELAY):
+        self.roles = roles  # name -> function run in the child
+        self.restart_delay = restart_delay
+        # A fresh interpreter rather than a fork, so no child inherits the other's threads or sockets
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = {}
+
+    def _spawn(self, name):
+        process = self._context.Process(target=self.roles[name], name=name)
+        process.start()
+        self._processes[name] = process
+        logger.info(f"Started the {name} process with pid {process.pid}")
+
+    def run(self, stop):
+        for name in self.roles:
+            self._spawn(name)
+        restart_at = {}
+        while not stop.wait(1):
+            for name, process in self._processes.items():
+                if name not in restart_at and not process.is_alive():
+                    logger.error(f"The {name} process exited with code {process.exitcode}, "
+                                 f"restarting in {self.restart_delay}s")
+                    restart_at[name] = time.monotonic() + self.restart_delay
+            for name, due in list(restart_at.items()):
+                if time.monotonic() >= due:
+                    del restart_at[name]
+                    self._spawn(name)
+        self.stop()
+
+    def stop(self, timeout=30):
+        # SIGTERM first: the scheduler finishes running jobs and releases the lease, gunicorn drains requests
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for name, process in self._processes.items():
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"The {name} process did not stop in time, killing it")
+                process.kill()
+                process.join()
+
+
+def _serve_waitress(web_app, config):
+    from waitress import serve
+    if config.web_workers > 1:
+        logger.warning("waitress runs a single process, WEB_WORKERS is ignored; use WEB_THREADS or gunicorn")
+    logger.info(f"Serving with waitress on {config.web_host}:{config.web_port}, {config.web_threads} threads")
+    serve(web_app, host=config.web_host, port=config.web_port, threads=config.web_threads)
+
+
+def _serve_gunicorn(web_app, config):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{config.web_host}:{config.web_port}")
+            self.cfg.set("workers", config.web_workers)
+            self.cfg.set("threads", config.web_threads)
+            self.cfg.set("worker_class", "gthread")
+
+        def load(self):
+            return web_app
+
+    logger.info(f"Serving with gunicorn on {config.web_host}:{config.web_port}, "
+                f"{config.web_workers} worker(s) x {config.web_threads} threads")
+    Application().run()
+
+
+def run_web():
+    # Web role: HTTP traffic only, through the WSGI server chosen by WEB_SERVER
+    setup_logging()
+    config = get_config()
+    web_app = create_app(admin=False)
+    if config.web_server == "gunicorn":
+        _serve_gunicorn(web_app, config)
+    elif config.web_server == "waitress":
+        _serve_waitress(web_app, config)
+    else:
+        raise ValueError(f"Unknown WEB_SERVER {config.web_server!r}, expected waitress or gunicorn")
+
+
+def serve(role="all"):
+    # Production entry point; 'all' supervises the web and scheduler roles as two processes
+    setup_logging()
+    if role == "scheduler":
+        run_scheduler()
+    elif role == "web":
+        run_web()
+    else:
+        stop = threading.Event()
+        _stop_on_signals(stop)
+        Supervisor({"scheduler": run_scheduler, "web": run_web}).run(stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve the notifier with a production WSGI server.')
+    parser.add_argument('--role', choices=ROLES, default="all",
+                        help="'web' serves HTTP only, 'scheduler' runs the jobs only, 'all' runs both "
+                             "as separate processes (default)")
+    args = parser.parse_args()
+    try:
+        serve(args.role)
+    except Exception as e:
+        logger.error(f"Failed to start the {args.role} role: {e}", exc_info=True)
+        sys.exit(1)
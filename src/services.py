@@ -0,0 +1,107 @@
+import sys
+import logging
+import threading
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from config import get_config
+from db_functions import DBConnection
+from generation_executor import GenerationExecutor
+from happy_birthday import HappyBirthday
+from public_holiday import PublicHoliday
+from pregenerate import MessagePregenerator
+from outbox import Outbox, OutboxWorker
+from routing import load_routing_table
+from local_delivery import LocalDeliveryScheduler
+from leader_lease import LeaderLease
+
+logger = logging.getLogger(__name__)
+
+
+class Services:
+    # Long-lived clients shared by the jobs, each built on first use rather than at import time
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self._instances = {}
+        self._lock = threading.RLock()  # Reentrant, building one service may build its dependencies
+
+    def _get(self, name, factory):
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = factory()
+                logger.debug(f"Initialized {name}")
+            return self._instances[name]
+
+    @property
+    def db_connection(self):
+        return self._get("db_connection", lambda: DBConnection(self.config.db_path))
+
+    @property
+    def generation_executor(self):
+        # Shared executor for LLM generation, concurrency is set by LLM_CONCURRENCY
+        return self._get("generation_executor", GenerationExecutor)
+
+    @property
+    def leader_lease(self):
+        # Replicas sharing the database elect one leader to run the scheduled jobs
+        if not self.config.leader_election:
+            return None
+        return self._get("leader_lease", lambda: LeaderLease(self.db_connection))
+
+    def _fence(self):
+        return self.leader_lease.fence if self.leader_lease is not None else None
+
+    @property
+    def outbox(self):
+        # Generated messages are queued in the database and delivered by a background worker with retries
+        if not self.config.outbox_enabled:
+            return None
+        return self._get("outbox", lambda: Outbox(self.db_connection, fence=self._fence()))
+
+    @property
+    def outbox_worker(self):
+        if self.outbox is None:
+            return None
+        return self._get("outbox_worker", lambda: OutboxWorker(self.outbox))
+
+    @property
+    def birthday_celebrator(self):
+        return self._get("birthday_celebrator", lambda: HappyBirthday(
+            self.db_connection, self.config.webhook_url, self.generation_executor, outbox=self.outbox,
+            routes=load_routing_table(self.config, HappyBirthday.DIVISION)))
+
+    @property
+    def public_holiday(self):
+        return self._get("public_holiday", lambda: PublicHoliday(
+            self.db_connection, self.config.webhook_url, self.generation_executor, outbox=self.outbox))
+
+    @property
+    def local_delivery(self):
+        # Runs the jobs that have a local send time once per timezone group
+        return self._get("local_delivery", lambda: LocalDeliveryScheduler(
+            self.db_connection, self.config.default_time_zone, self.config.local_delivery_window_minutes,
+            fence=self._fence()))
+
+    @property
+    def message_pregenerator(self):
+        # Render the next days' messages ahead of time so the send jobs only read them;
+        # holiday announcements are rendered per timezone group when they are sent that way
+        zone_groups = self.local_delivery.zone_groups if self.config.holiday_local_time else None
+        return self._get("message_pregenerator", lambda: MessagePregenerator(
+            self.birthday_celebrator, self.public_holiday, zone_groups=zone_groups))
+
+
+_services = None
+_services_lock = threading.Lock()
+
+
+def get_services():
+    global _services
+    with _services_lock:
+        if _services is None:
+            _services = Services()
+        return _services
@@ -0,0 +1,85 @@
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# One line of `python -X importtime` output: "import time: self [us] | cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+class StartupTimer:
+    # Named checkpoints from process start to the first served request
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def report(self):
+        # Duration of each step and the total, in seconds
+        steps = {}
+        previous = self.started
+        for name, at in self.marks:
+            steps[name] = round(at - previous, 3)
+            previous = at
+        steps["total"] = round(previous - self.started, 3)
+        return steps
+
+    def log_report(self):
+        steps = self.report()
+        logger.info("Startup timing: " + ", ".join(f"{name}={seconds:.3f}s" for name, seconds in steps.items()))
+        return steps
+
+
+def import_profile(module="main", top=20):
+    # Import a module in a fresh interpreter with -X importtime and return the slowest top-level imports
+    src_dir = Path(__file__).resolve().parent
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=src_dir,
+                            capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=str(src_dir)))
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1]}")
+
+    # Nested imports are printed before their parent, indented two more spaces per level
+    modules, children, total = [], [], 0.0
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 1:
+            children.append((match.group(4), int(match.group(2)) / 1e6))
+        elif depth == 0:
+            if match.group(4) == module:
+                # Only the profiled module's direct imports, so times do not double count
+                modules = children
+                total = int(match.group(2)) / 1e6
+            children = []
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return {"module": module, "wall_seconds": round(wall, 3), "import_seconds": round(total, 3),
+            "slowest": modules[:top]}
+
+
+def print_import_profile(module="main", top=20):
+    profile = import_profile(module, top)
+    print(f"Importing {profile['module']}: {profile['import_seconds']:.3f}s of imports, "
+          f"{profile['wall_seconds']:.3f}s including interpreter start")
+    for name, seconds in profile["slowest"]:
+        print(f"  {seconds * 1000:9.1f} ms  {name}")
+    return profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Report how long importing a module takes, per top-level import.')
+    parser.add_argument('--module', type=str, help='Module to import, default main', default="main")
+    parser.add_argument('--top', type=int, help='Number of slowest imports to list', default=20)
+    args = parser.parse_args()
+    print_import_profile(args.module, args.top)
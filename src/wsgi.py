@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+# Add the project root to the system path for module resolution
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+# Import custom modules
+from logging_config import setup_logging
+from main import create_app
+
+# HTTP only, for running under an external WSGI server, e.g.
+#   gunicorn --chdir src --workers 2 --threads 8 --worker-class gthread wsgi:app
+# Scheduled jobs do not run here; start them once with `python src/serve.py --role scheduler`.
+setup_logging()
+app = create_app(admin=False)
@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+from bulk_writer import BulkWriter
+
+INSERT = "INSERT OR REPLACE INTO Items (id, name) VALUES (?, ?)"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "bulk.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE Items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE Other (id INTEGER PRIMARY KEY)")
+    return path
+
+
+def count(path, table="Items"):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_staged_writes_hold_no_lock_and_stay_invisible_until_commit(db_path):
+    with BulkWriter(db_path, batch_size=2) as writer:
+        for index in range(5):
+            writer.add("Items", INSERT, (index, f"item {index}"), key=index)
+        writer.execute("UPDATE Items SET name = 'renamed' WHERE id = ?", (0,))
+        # Other writers are not blocked while the import is still fetching
+        with sqlite3.connect(db_path, timeout=0.1) as conn:
+            conn.execute("INSERT INTO Other (id) VALUES (1)")
+        assert count(db_path) == 0
+    assert count(db_path) == 5
+    assert count(db_path, "Other") == 1
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT name FROM Items WHERE id = 0").fetchone()[0] == "renamed"
+    assert writer.stats()["rows"] == {"Items": 5}
+
+
+def test_failed_import_writes_nothing(db_path):
+    with pytest.raises(RuntimeError):
+        with BulkWriter(db_path, batch_size=2) as writer:
+            for index in range(5):
+                writer.add("Items", INSERT, (index, "item"))
+            raise RuntimeError("fetch failed")
+    assert count(db_path) == 0
+
+
+def test_failing_statement_rolls_back_the_whole_run(db_path):
+    with pytest.raises(sqlite3.OperationalError):
+        with BulkWriter(db_path, batch_size=2) as writer:
+            for index in range(3):
+                writer.add("Items", INSERT, (index, "item"))
+            writer.execute("UPDATE Missing SET id = 1")
+    assert count(db_path) == 0
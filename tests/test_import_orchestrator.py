@@ -0,0 +1,108 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+import import_orchestrator
+from import_orchestrator import ImportOrchestrator
+
+
+class PagedStream:
+    # Stand-in for a RecordStream: yields `pages` batches, slowly, or raises after `fail_after` of them
+    def __init__(self, pages, delay=0.0, fail_after=None):
+        self.total = pages
+        self.delay = delay
+        self.fail_after = fail_after
+        self.pages = 0
+
+    def batches(self):
+        for page in range(self.total):
+            if self.fail_after is not None and page >= self.fail_after:
+                raise ConnectionError("holidays page failed")
+            time.sleep(self.delay)
+            self.pages += 1
+            yield [{"id": page}]
+
+
+class StubWriter:
+    def stats(self):
+        return {}
+
+
+class StubImporter:
+    def __init__(self, employees, holidays):
+        self.employees = employees
+        self.holidays = holidays
+        self.api = self
+        self.written = {"employees": 0, "holidays": 0}
+        self.rolled_back = False
+
+    def begin_employee_sync(self):
+        pass
+
+    def finish_employee_sync(self):
+        pass
+
+    def stream_employees(self, read_ahead, executor):
+        return self.employees
+
+    def stream_holidays(self, read_ahead, executor):
+        return self.holidays
+
+    def list_all_holiday_policies(self):
+        return {"data": []}
+
+    @contextmanager
+    def bulk_write(self):
+        try:
+            yield StubWriter()
+        except Exception:
+            self.rolled_back = True
+            raise
+
+    def write_employees(self, batch):
+        self.written["employees"] += len(batch)
+
+    def write_holiday_policies(self, policies):
+        pass
+
+    def write_holidays(self, batch):
+        self.written["holidays"] += len(batch)
+
+
+def run_with_timeout(orchestrator, timeout=10):
+    outcome = {}
+
+    def target():
+        try:
+            outcome["report"] = orchestrator.run()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "import did not finish"
+    return outcome
+
+
+@pytest.fixture(autouse=True)
+def no_database(monkeypatch):
+    monkeypatch.setattr(import_orchestrator, "create_database", lambda: None)
+
+
+def test_import_writes_every_page():
+    importer = StubImporter(PagedStream(5), PagedStream(3))
+    outcome = run_with_timeout(ImportOrchestrator(importer, max_in_flight=2, prefetch_pages=1))
+    assert "error" not in outcome
+    assert importer.written == {"employees": 5, "holidays": 3}
+
+
+def test_failing_producer_stops_the_import_instead_of_hanging():
+    # Holidays fail at once while employees are still paging; the employees producer then stops
+    # without queueing its end marker, and the writer must not wait for it forever
+    importer = StubImporter(PagedStream(50, delay=0.02), PagedStream(3, fail_after=0))
+    outcome = run_with_timeout(ImportOrchestrator(importer, max_in_flight=2, prefetch_pages=1))
+    assert isinstance(outcome.get("error"), ConnectionError)
+    assert importer.rolled_back
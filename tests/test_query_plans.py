@@ -0,0 +1,30 @@
+import pytest
+
+from query_plan_check import FULL_SCAN_EXEMPTIONS, check_query_plans, create_schema, production_queries
+
+
+@pytest.fixture(scope="module")
+def plan_results(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp("query_plans") / "schema.db"
+    create_schema(db_path)
+    return check_query_plans(db_path)
+
+
+def test_every_sql_constant_is_checked():
+    names = {name for name, _, _ in production_queries()}
+    # Statements from every module that talks to the database
+    for name in ("FIND_HOLIDAYS_QUERY", "ZONE_DELIVERY_CLAIM", "ZONE_DELIVERY_FINISH", "LEASE_ACQUIRE",
+                 "LEASE_RELEASE", "CLAIM_ENTRY_UPDATE", "MARK_SENT_UPDATE", "CACHE_ENTRY_SELECT",
+                 "LEAST_RECENTLY_USED_DELETE", "STORED_MESSAGE_INSERT", "SYNC_STATE_UPSERT"):
+        assert name in names
+    assert set(FULL_SCAN_EXEMPTIONS) <= names
+
+
+def test_no_query_falls_back_to_a_full_scan(plan_results):
+    failures, _ = plan_results
+    assert failures == []
+
+
+def test_every_exemption_is_still_needed(plan_results):
+    _, exempted = plan_results
+    assert {name for name, _ in exempted} == set(FULL_SCAN_EXEMPTIONS)